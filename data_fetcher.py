@@ -1,40 +1,155 @@
 # data_fetcher.py
 
-import requests
-import time
-import json
-import paho.mqtt.publish as publish
+import asyncio
+import logging
 import os
+import random
+import aiohttp
+from edge_publisher import async_http_session, publisher
 
-MQTT_BROKER = os.getenv('MQTT_BROKER', 'mqtt')
-MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
-ROOM_ID = os.getenv('ROOM_ID', '1')
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('data_fetcher')
 
+# Rooms polled by this gateway, e.g. "101-130,140"; ROOM_ID alone still works for one room
+ROOM_IDS = os.getenv('ROOM_IDS', os.getenv('ROOM_ID', '1'))
 SENSOR_URLS = {
-    'iaq': f'http://iaq_sensor_room{ROOM_ID}:5000/sensor/data',
-    'life_being': f'http://life_being_sensor_room{ROOM_ID}:5001/sensor/data',
+    'iaq': os.getenv('IAQ_URL_TEMPLATE', 'http://iaq_sensor_room{room}:5000/sensor/data'),
+    'life_being': os.getenv('LIFE_BEING_URL_TEMPLATE', 'http://life_being_sensor_room{room}:5001/sensor/data'),
 }
+FETCH_INTERVAL = float(os.getenv('FETCH_INTERVAL', 5))
+# A sensor that doesn't answer within the timeout is skipped until its next turn
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 2))
+FETCH_JITTER = float(os.getenv('FETCH_JITTER', 0.1))
+FETCH_CONNECTIONS = int(os.getenv('FETCH_CONNECTIONS', 50))
+# Readings are collected and published together this often
+PUBLISH_INTERVAL = float(os.getenv('PUBLISH_INTERVAL', 1))
+# Readings held while the broker is unreachable, the oldest are dropped first
+MAX_PENDING = int(os.getenv('FETCH_MAX_PENDING', 10000))
 
-def fetch_sensor_data():
-    while True:
-        for sensor_type, url in SENSOR_URLS.items():
+def parse_rooms(value):
+    """'101-103,110' -> ['101', '102', '103', '110']"""
+    rooms = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        first, _, last = item.partition('-')
+        if last:
+            rooms.extend(str(room) for room in range(int(first), int(last) + 1))
+        else:
+            rooms.append(item)
+    return rooms
+
+class DataFetcher:
+    """
+    Polls the sensors of many rooms concurrently. Every (room, sensor) pair
+    runs on its own jittered schedule with a per-request timeout, so a hung
+    sensor only delays itself. HTTP connections are reused across polls,
+    and the readings collected are published in batches over one MQTT
+    connection.
+    """
+
+    def __init__(self, rooms, sensor_urls=SENSOR_URLS, interval=FETCH_INTERVAL, timeout=FETCH_TIMEOUT,
+                 jitter=FETCH_JITTER, connections=FETCH_CONNECTIONS, publish_interval=PUBLISH_INTERVAL):
+        self.rooms = rooms
+        self.sensor_urls = sensor_urls
+        self.interval = interval
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.jitter = jitter
+        self.connections = connections
+        self.publish_interval = publish_interval
+        self.pending = []
+        self.publisher = publisher()
+        self.session = None
+        self.counts = {'fetched': 0, 'failed': 0, 'timeouts': 0, 'skipped': 0, 'published': 0, 'dropped': 0}
+
+    async def run(self, duration=None):
+        self.publisher.start()
+        async with async_http_session(limit=self.connections) as self.session:
+            tasks = [
+                asyncio.create_task(self.poll(room, sensor_type, url.format(room=room)))
+                for room in self.rooms
+                for sensor_type, url in self.sensor_urls.items()
+            ]
+            tasks.append(asyncio.create_task(self.flush_periodically()))
+            tasks.append(asyncio.create_task(self.report()))
+            logger.info(f"Polling {len(tasks) - 2} sensors in {len(self.rooms)} rooms every {self.interval}s")
             try:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    data = response.json()
-                    topic = f"hotel/room/{ROOM_ID}/{sensor_type}"
-                    publish.single(
-                        topic=topic,
-                        payload=json.dumps(data),
-                        hostname=MQTT_BROKER,
-                        port=MQTT_PORT
-                    )
-                    print(f"Published data to topic {topic}")
-                else:
-                    print(f"No data from {sensor_type}")
-            except Exception as e:
-                print(f"Error fetching data from {sensor_type}: {e}")
-        time.sleep(5)
+                await asyncio.wait(tasks, timeout=duration)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self.flush()
+
+    async def poll(self, room, sensor_type, url):
+        topic = f"hotel/room/{room}/{sensor_type}"
+        loop = asyncio.get_running_loop()
+        # Stagger the first polls so the rooms don't all hit the network at once
+        due = loop.time() + random.uniform(0, self.interval)
+        while True:
+            await asyncio.sleep(max(due - loop.time(), 0))
+            data = await self.fetch(sensor_type, url)
+            if data is not None:
+                self.pending.append((topic, data))
+            due += self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            # Skip the turns a slow poll has missed instead of catching up in a burst
+            now = loop.time()
+            if due < now:
+                missed = int((now - due) // self.interval) + 1
+                self.counts['skipped'] += missed
+                due += missed * self.interval
+
+    async def fetch(self, sensor_type, url):
+        try:
+            async with self.session.get(url, timeout=self.timeout) as response:
+                if response.status != 200:
+                    self.counts['failed'] += 1
+                    logger.debug(f"No data from {url}: {response.status}")
+                    return None
+                data = await response.json(content_type=None)
+        except asyncio.TimeoutError:
+            self.counts['timeouts'] += 1
+            logger.debug(f"Timed out fetching {url}")
+            return None
+        except (aiohttp.ClientError, ValueError) as e:
+            self.counts['failed'] += 1
+            logger.debug(f"Error fetching {url}: {e}")
+            return None
+        self.counts['fetched'] += 1
+        return data
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            self.flush()
+
+    def flush(self):
+        """Publish the readings collected since the last flush"""
+        if not self.publisher.connected:
+            if len(self.pending) > MAX_PENDING:
+                self.counts['dropped'] += len(self.pending) - MAX_PENDING
+                del self.pending[:-MAX_PENDING]
+            return
+        batch, self.pending = self.pending, []
+        for topic, data in batch:
+            if self.publisher.publish(topic, data):
+                self.counts['published'] += 1
+            else:
+                self.counts['dropped'] += 1
+
+    async def report(self, every=30):
+        while True:
+            await asyncio.sleep(every)
+            logger.info(', '.join(f"{count} {name}" for name, count in self.counts.items()))
+
+def fetch_sensor_data():
+    fetcher = DataFetcher(parse_rooms(ROOM_IDS))
+    try:
+        asyncio.run(fetcher.run())
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == '__main__':
     fetch_sensor_data()
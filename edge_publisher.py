@@ -0,0 +1,149 @@
+# edge_publisher.py
+
+import json
+import logging
+import os
+import threading
+import time
+import paho.mqtt.client as mqtt
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+MQTT_BROKER = os.getenv('MQTT_BROKER', 'mqtt')
+MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
+MQTT_USERNAME = os.getenv('MQTT_USERNAME')
+MQTT_PASSWORD = os.getenv('MQTT_PASSWORD')
+MQTT_QOS = int(os.getenv('MQTT_QOS', 0))
+# QoS 1/2 messages awaiting the broker's acknowledgement before further ones are held back
+MQTT_MAX_INFLIGHT = int(os.getenv('MQTT_MAX_INFLIGHT', 100))
+# Messages kept while disconnected; older readings are worth less than a bounded memory
+MQTT_MAX_QUEUED = int(os.getenv('MQTT_MAX_QUEUED', 10000))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+
+class MQTTPublisher:
+    """
+    One long-lived MQTT connection for an edge process. Connects in the
+    background and reconnects on its own; QoS 1/2 messages published while
+    the connection is down are queued (up to max_queued) and sent once it is
+    back, QoS 0 ones are dropped. Subscriptions are renewed on every reconnect.
+    """
+
+    def __init__(self, broker=MQTT_BROKER, port=MQTT_PORT, qos=MQTT_QOS, max_inflight=MQTT_MAX_INFLIGHT,
+                 max_queued=MQTT_MAX_QUEUED, username=MQTT_USERNAME, password=MQTT_PASSWORD, client_id=''):
+        self.broker = broker
+        self.port = port
+        self.qos = qos
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+        if hasattr(mqtt, 'CallbackAPIVersion'):
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=client_id)
+        else:
+            self.client = mqtt.Client(client_id=client_id)
+        if username:
+            self.client.username_pw_set(username, password)
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.max_queued_messages_set(max_queued)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.started = False
+
+    def start(self):
+        """Connect in the background, called on first use"""
+        with self.lock:
+            if self.started:
+                return
+            self.client.connect_async(self.broker, self.port, 60)
+            self.client.loop_start()
+            self.started = True
+
+    def wait_connected(self, timeout=10):
+        """Start and wait up to timeout seconds for the connection, returns whether it is up"""
+        self.start()
+        deadline = time.monotonic() + timeout
+        while not self.connected and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.connected
+
+    def stop(self):
+        with self.lock:
+            if not self.started:
+                return
+            self.client.disconnect()
+            self.client.loop_stop()
+            self.started = False
+
+    @property
+    def connected(self):
+        return self.client.is_connected()
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            logger.error(f"MQTT connection to {self.broker}:{self.port} refused: rc={rc}")
+            return
+        logger.info(f"Connected to MQTT broker {self.broker}:{self.port}")
+        with self.lock:
+            subscriptions = list(self.subscriptions.items())
+        for topic, (callback, qos) in subscriptions:
+            client.subscribe(topic, qos=qos)
+
+    def on_disconnect(self, client, userdata, rc):
+        if rc != 0:
+            logger.warning(f"Lost MQTT connection to {self.broker}:{self.port}, reconnecting")
+
+    def publish(self, topic, payload, qos=None):
+        """Queue a message (dicts are sent as JSON), returns False if it was dropped"""
+        self.start()
+        if not isinstance(payload, (str, bytes)):
+            payload = json.dumps(payload)
+        qos = self.qos if qos is None else qos
+        result = self.client.publish(topic, payload, qos=qos)
+        # paho keeps QoS 1/2 messages for the reconnect, but still reports NO_CONN
+        queued = result.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0
+        if result.rc != mqtt.MQTT_ERR_SUCCESS and not queued:
+            self.dropped += 1
+            logger.debug(f"Dropped MQTT message to {topic}: rc={result.rc}")
+            return False
+        self.published += 1
+        return True
+
+    def subscribe(self, topic, callback, qos=1):
+        """Call callback(client, userdata, msg) for messages on topic, kept across reconnects"""
+        with self.lock:
+            self.subscriptions[topic] = (callback, qos)
+        self.client.message_callback_add(topic, callback)
+        self.start()
+        if self.client.is_connected():
+            self.client.subscribe(topic, qos=qos)
+
+def http_session(pool_size=HTTP_POOL_SIZE):
+    """A requests session keeping up to pool_size connections per host alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def async_http_session(limit=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT):
+    """An aiohttp session with a bounded connection pool, for asyncio edge processes"""
+    import aiohttp
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=limit),
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    )
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+def publisher():
+    """The process wide publisher, configured from the environment"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = MQTTPublisher()
+        return _publisher
@@ -34,7 +34,8 @@ python manage.py createsuperuser --noinput || true
 
 # Start server
 echo "Starting server..."
-exec gunicorn smart_hotel_project.wsgi:application \
+exec gunicorn smart_hotel_project.asgi:application \
+    --worker-class uvicorn.workers.UvicornWorker \
     --bind 0.0.0.0:8000 \
     --workers 3 \
     --timeout 120 \
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Hotel, Floor, Room, LifeBeingSensorData, IAQSensorData
+from .models import Hotel, Floor, Room, LifeBeingSensorData, IAQSensorData, AutomationRule
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
@@ -20,3 +20,8 @@ class LifeBeingSensorDataAdmin(admin.ModelAdmin):
 @admin.register(IAQSensorData)
 class IAQSensorDataAdmin(admin.ModelAdmin):
     list_display = ('id', 'room', 'noise', 'co2', 'pm25', 'humidity', 'temperature', 'illuminance', 'online_status', 'device_status', 'timestamp')
+
+@admin.register(AutomationRule)
+class AutomationRuleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'hotel', 'metric', 'operator', 'threshold', 'hysteresis', 'duration', 'action', 'enabled')
+    list_filter = ('metric', 'action', 'enabled')
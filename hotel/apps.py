@@ -9,6 +9,7 @@ class HotelConfig(AppConfig):
     def ready(self):
         """Initialize services when Django starts"""
         import os
+        from hotel import signals  # noqa: F401
         if os.environ.get('RUN_EVENT_STREAM') == 'true':
             from hotel.event_handler import start_event_stream
             start_event_stream()
\ No newline at end of file
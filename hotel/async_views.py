@@ -0,0 +1,140 @@
+# async_views.py
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework import status
+from .models import Room
+from .fast_serializers import iaq_sensor_data_reader, life_being_sensor_data_reader
+from .renderers import FastJSONRenderer
+from .reports import get_room_status_data, get_energy_report_data
+from . import views
+
+logger = logging.getLogger(__name__)
+
+# The ORM is synchronous, so queries run on a bounded pool of worker threads
+# while the event loop keeps serving other requests. The pool size also caps
+# the number of database connections a single process opens for these views.
+_db_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_DB_THREADS', 20),
+    thread_name_prefix='async-db'
+)
+_renderer = FastJSONRenderer()
+
+class RoomNotFound(Exception):
+    pass
+
+def _call_with_connection_cleanup(function, *args, **kwargs):
+    """Mirror the request lifecycle's connection handling in a worker thread"""
+    close_old_connections()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+async def run_db(function, *args, **kwargs):
+    """Run a blocking ORM function in the database thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _db_executor,
+        functools.partial(_call_with_connection_cleanup, function, *args, **kwargs)
+    )
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        _renderer.render(data),
+        status=status_code,
+        content_type='application/json'
+    )
+
+def _room_not_found(number):
+    return json_response(
+        {"error": f"Room {number} not found."},
+        status.HTTP_404_NOT_FOUND
+    )
+
+def _method_not_allowed(request):
+    return json_response(
+        {"detail": f'Method "{request.method}" not allowed.'},
+        status.HTTP_405_METHOD_NOT_ALLOWED
+    )
+
+def _get_room(number):
+    try:
+        return Room.objects.get(number=number)
+    except Room.DoesNotExist:
+        raise RoomNotFound(number)
+
+def _room_status(number):
+    return get_room_status_data(_get_room(number))
+
+def _room_energy_report(number, days):
+    return get_energy_report_data(_get_room(number), days)
+
+def _room_readings(number, reader, related_name):
+    room = _get_room(number)
+    return reader.to_representation(getattr(room, related_name).all())
+
+async def room_status_by_number(request, number):
+    """Get room status by room number"""
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    try:
+        return json_response(await run_db(_room_status, number))
+    except RoomNotFound:
+        return _room_not_found(number)
+
+async def room_energy_report_by_number(request, number):
+    """Get energy report by room number"""
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    try:
+        days = int(request.GET.get('days', 1))
+    except ValueError:
+        return json_response({"error": "days must be an integer."}, status.HTTP_400_BAD_REQUEST)
+    try:
+        return json_response(await run_db(_room_energy_report, number, days))
+    except RoomNotFound:
+        return _room_not_found(number)
+
+_create_iaq_by_number = views.IAQSensorDataViewSet.as_view({'post': 'create_by_number'})
+_create_life_being_by_number = views.LifeBeingSensorDataViewSet.as_view({'post': 'create_by_number'})
+
+def _create_reading(view, request, number):
+    # Rendered in the worker thread as well, so the event loop only sends the bytes
+    return view(request, number=number).render()
+
+async def room_iaq_data_by_number(request, number):
+    """Get IAQ data by room number; writes still go through the DRF view"""
+    if request.method == 'POST':
+        return await run_db(_create_reading, _create_iaq_by_number, request, number)
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    try:
+        return json_response(await run_db(_room_readings, number, iaq_sensor_data_reader, 'iaq_data'))
+    except RoomNotFound:
+        return _room_not_found(number)
+
+async def room_life_being_data_by_number(request, number):
+    """Get life being data by room number; writes still go through the DRF view"""
+    if request.method == 'POST':
+        return await run_db(_create_reading, _create_life_being_by_number, request, number)
+    if request.method != 'GET':
+        return _method_not_allowed(request)
+    try:
+        return json_response(await run_db(_room_readings, number, life_being_sensor_data_reader, 'life_being_data'))
+    except RoomNotFound:
+        return _room_not_found(number)
+
+# Django 3.2's decorators wrap views in sync functions, which would hide the
+# coroutine, so CSRF exemption (enforced by DRF on the write path) is set directly
+for _view in (
+    room_status_by_number,
+    room_energy_report_by_number,
+    room_iaq_data_by_number,
+    room_life_being_data_by_number,
+):
+    _view.csrf_exempt = True
@@ -0,0 +1,238 @@
+# automation.py
+import logging
+import time
+from datetime import timedelta
+import numpy as np
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .models import (
+    Room,
+    ACControl,
+    LightingControl,
+    DeviceAutomation,
+    IAQSensorData,
+    ACMode
+)
+from .device_control import ac_command_topic, lighting_command_topic, publish_device_commands
+from .device_state import registry
+from . import thermal
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+AC_MODES = np.array([ACMode.COOL, ACMode.HEAT, ACMode.FAN, ACMode.AUTO, ACMode.OFF], dtype=object)
+COOL, HEAT, FAN, AUTO, OFF = range(len(AC_MODES))
+MODE_INDEX = {mode: index for index, mode in enumerate(AC_MODES)}
+
+MIN_SETPOINT = 16.0
+MAX_SETPOINT = 30.0
+
+_defaults = {field.name: field.default for field in DeviceAutomation._meta.fields if field.has_default()}
+
+class RoomBatch:
+    """Column arrays describing the current state of a set of rooms"""
+
+    def __init__(self, rows, states):
+        self.room_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.room_numbers = [row[1] for row in rows]
+        self.index = {room_id: i for i, room_id in enumerate(self.room_ids.tolist())}
+        size = len(rows)
+
+        def column(position, default, dtype):
+            return np.array(
+                [default if row[position] is None else row[position] for row in rows],
+                dtype=dtype
+            )
+
+        self.temperature = column(2, np.nan, float)
+        self.illuminance = column(3, np.nan, float)
+        self.occupied = column(4, False, bool)
+        self.ac_auto_adjust = column(5, _defaults['ac_auto_adjust'], bool)
+        self.lighting_auto_adjust = column(6, _defaults['lighting_auto_adjust'], bool)
+        self.comfort_temperature = column(7, _defaults['comfort_temperature'], float)
+
+        # Device state records from the registry, rooms without a control get None
+        self.ac_states = [None] * size
+        self.ac_mode = np.full(size, OFF, dtype=np.int64)
+        self.ac_temperature = np.full(size, np.nan)
+        self.lighting_states = [None] * size
+        self.brightness = np.full(size, -1, dtype=np.int64)
+        for room_id, state in states.items():
+            i = self.index[room_id]
+            if state.ac is not None and state.ac.control_id is not None:
+                self.ac_states[i] = state.ac
+                self.ac_mode[i] = MODE_INDEX.get(state.ac.mode, OFF)
+                self.ac_temperature[i] = state.ac.temperature
+            if state.lighting is not None and state.lighting.control_id is not None:
+                self.lighting_states[i] = state.lighting
+                self.brightness[i] = state.lighting.brightness
+        self.has_ac = np.array([state is not None for state in self.ac_states], dtype=bool)
+        self.has_lighting = self.brightness >= 0
+
+        # Vacant rooms that should start conditioning before expected occupancy
+        self.precondition = np.zeros(size, dtype=bool)
+
+    def __len__(self):
+        return len(self.room_ids)
+
+class BatchAutomationEngine:
+    """
+    Computes AC and lighting targets for many rooms at once. Latest
+    readings, occupancy and automation settings are loaded with a few queries,
+    device state comes from the in-memory registry, the decision logic runs
+    on NumPy arrays, and only the controls whose targets changed are written
+    back with bulk_update.
+    """
+
+    def __init__(self, deadband=0.5, dim_illuminance=300.0, bright_level=100, dim_level=50,
+                 precondition_horizon=60, precondition_margin=5):
+        self.deadband = deadband
+        self.dim_illuminance = dim_illuminance
+        self.bright_level = bright_level
+        self.dim_level = dim_level
+        self.precondition_horizon = precondition_horizon
+        self.precondition_margin = precondition_margin
+
+    def load(self, rooms=None):
+        """Load the state of the given rooms (all rooms by default) into arrays"""
+        rooms = Room.objects.all() if rooms is None else rooms
+        if not hasattr(rooms, 'query'):
+            rooms = Room.objects.filter(pk__in=[getattr(room, 'pk', room) for room in rooms])
+
+        latest_iaq = IAQSensorData.objects.filter(room=OuterRef('pk')).order_by('-timestamp')
+        rows = list(rooms.order_by().annotate(
+            latest_temperature=Subquery(latest_iaq.values('temperature')[:1]),
+            latest_illuminance=Subquery(latest_iaq.values('illuminance')[:1]),
+        ).values_list(
+            'id', 'number', 'latest_temperature', 'latest_illuminance', 'is_occupied',
+            'automation__ac_auto_adjust', 'automation__lighting_auto_adjust',
+            'automation__comfort_temperature'
+        ))
+        batch = RoomBatch(rows, registry.get_many([row[0] for row in rows]))
+        if self.precondition_horizon:
+            self.plan_preconditioning(batch)
+        return batch
+
+    def plan_preconditioning(self, batch):
+        """
+        Flag vacant rooms whose thermal model says they need at least as long
+        to reach the comfort temperature as is left until expected occupancy
+        """
+        candidates = np.flatnonzero(
+            ~batch.occupied & batch.has_ac & batch.ac_auto_adjust & ~np.isnan(batch.temperature)
+        )
+        if not len(candidates):
+            return
+        expected = thermal.minutes_to_expected_occupancy(
+            Room.objects.filter(pk__in=batch.room_ids[candidates].tolist()),
+            timedelta(minutes=self.precondition_horizon)
+        )
+        if not expected:
+            return
+        candidates = np.array([i for i in candidates.tolist() if batch.room_ids[i] in expected], dtype=np.int64)
+        minutes_left = np.array([expected[batch.room_ids[i]] for i in candidates.tolist()])
+        needed = thermal.minutes_to_setpoint(
+            batch.temperature[candidates],
+            np.clip(batch.comfort_temperature[candidates], MIN_SETPOINT, MAX_SETPOINT),
+            thermal.load_rates(batch.room_ids[candidates].tolist()),
+            tolerance=self.deadband
+        )
+        batch.precondition[candidates] = needed + self.precondition_margin >= minutes_left
+
+    def compute(self, batch):
+        """Return (ac_mode, ac_temperature, brightness) target arrays"""
+        occupied = batch.occupied
+        comfort = np.clip(batch.comfort_temperature, MIN_SETPOINT, MAX_SETPOINT)
+        temperature = batch.temperature
+        known = ~np.isnan(temperature)
+
+        manage_ac = batch.has_ac & batch.ac_auto_adjust
+        conditioned = occupied | batch.precondition
+        occupied_mode = np.select(
+            [~known, temperature > comfort + self.deadband, temperature < comfort - self.deadband],
+            [AUTO, COOL, HEAT],
+            default=FAN
+        )
+        ac_mode = np.where(manage_ac, np.where(conditioned, occupied_mode, OFF), batch.ac_mode)
+        ac_temperature = np.where(manage_ac & conditioned, comfort, batch.ac_temperature)
+
+        manage_lighting = batch.has_lighting & batch.lighting_auto_adjust & occupied & ~np.isnan(batch.illuminance)
+        brightness = np.where(
+            manage_lighting,
+            np.where(batch.illuminance < self.dim_illuminance, self.bright_level, self.dim_level),
+            batch.brightness
+        )
+        return ac_mode, ac_temperature, brightness
+
+    def apply(self, batch, targets):
+        """Write back only the controls whose targets changed"""
+        ac_mode, ac_temperature, brightness = targets
+        now = timezone.now()
+
+        ac_changed = batch.has_ac & (
+            (ac_mode != batch.ac_mode) | ~np.isclose(ac_temperature, batch.ac_temperature, equal_nan=True)
+        )
+        lighting_changed = batch.has_lighting & (brightness != batch.brightness)
+        unchanged = int((batch.has_ac & ~ac_changed).sum() + (batch.has_lighting & ~lighting_changed).sum())
+
+        ac_updates, lighting_updates, commands = [], [], []
+        for i in np.flatnonzero(ac_changed).tolist():
+            state = batch.ac_states[i]
+            control = ACControl(
+                id=state.control_id,
+                mode=AC_MODES[ac_mode[i]],
+                temperature=float(ac_temperature[i]),
+                updated_at=now
+            )
+            ac_updates.append((batch.room_ids[i], state, control))
+            commands.append((
+                ac_command_topic(batch.room_numbers[i]),
+                {'mode': control.mode, 'temperature': control.temperature}
+            ))
+        for i in np.flatnonzero(lighting_changed).tolist():
+            state = batch.lighting_states[i]
+            control = LightingControl(id=state.control_id, brightness=int(brightness[i]), updated_at=now)
+            lighting_updates.append((batch.room_ids[i], state, control))
+            commands.append((
+                lighting_command_topic(batch.room_numbers[i]),
+                {'brightness': control.brightness}
+            ))
+
+        with transaction.atomic():
+            if ac_updates:
+                ACControl.objects.bulk_update(
+                    [control for _, _, control in ac_updates], ['mode', 'temperature', 'updated_at']
+                )
+            if lighting_updates:
+                LightingControl.objects.bulk_update(
+                    [control for _, _, control in lighting_updates], ['brightness', 'updated_at']
+                )
+            for room_id, state, control in ac_updates:
+                registry.update(
+                    int(room_id), 'AC', state.device_id,
+                    mode=control.mode, temperature=control.temperature, updated_at=now
+                )
+            for room_id, state, control in lighting_updates:
+                registry.update(
+                    int(room_id), 'LIGHTING', state.device_id, brightness=control.brightness, updated_at=now
+                )
+
+        metrics.increment('controls.writes', len(ac_updates) + len(lighting_updates))
+        metrics.increment('controls.skipped_writes', unchanged)
+        publish_device_commands(commands)
+        return len(ac_updates), len(lighting_updates)
+
+    def run(self, rooms=None):
+        """Evaluate automation for the given rooms (all rooms by default)"""
+        start = time.perf_counter()
+        batch = self.load(rooms)
+        ac_updated, lighting_updated = self.apply(batch, self.compute(batch)) if len(batch) else (0, 0)
+        summary = {
+            'rooms': len(batch),
+            'ac_updated': ac_updated,
+            'lighting_updated': lighting_updated,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+        logger.info(f"Automation run: {summary}")
+        return summary
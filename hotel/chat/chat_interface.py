@@ -1,26 +1,50 @@
+import asyncio
 import json
 import os
 import time
 import requests
 import logging
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 from django.conf import settings
-import paho.mqtt.publish as mqtt_publish
+from hotel.device_control import publish_device_commands, set_recorded_device_status
+from hotel.device_state import registry
+from hotel.dispatcher import COMMAND_TOPIC
+from hotel.models import DeviceStatus
+from hotel.metrics import metrics
+from hotel.async_views import run_db
+from .executor import ActionError, executor
+from .intents import parse_intent
+from .response_cache import response_cache
+from .sessions import store_from_settings
 
 logger = logging.getLogger(__name__)
 
+# Used when a caller has no chat session, e.g. the connection check
+DEFAULT_SESSION = 'default'
+
+# Runs are polled quickly at first, then less often the longer they take
+RUN_POLL_INITIAL = 0.1
+RUN_POLL_BACKOFF = 1.5
+RUN_POLL_MAX = 2.0
+
+def assistant_client():
+    """The Azure OpenAI client, or the local fake when CHAT_ASSISTANT_CLIENT is 'fake'"""
+    if getattr(settings, 'CHAT_ASSISTANT_CLIENT', 'azure') == 'fake':
+        from .fake_client import FakeAssistantClient
+        return FakeAssistantClient(latency=getattr(settings, 'CHAT_FAKE_ASSISTANT_LATENCY', 1.0))
+    return AsyncAzureOpenAI(
+        azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT'),
+        api_key=os.getenv('AZURE_OPENAI_API_KEY'),
+        api_version=os.getenv('AZURE_OPENAI_API_VERSION')
+    )
+
 class ChatInterface:
-    def __init__(self):
-        self.azure_endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
-        self.api_key = os.getenv('AZURE_OPENAI_API_KEY')
-        self.api_version = os.getenv('AZURE_OPENAI_API_VERSION')
+    def __init__(self, client=None, sessions=None, cache=None):
         self.assistant_id = os.getenv('AZURE_OPENAI_ASSISTANT_ID')
-        self.client = AzureOpenAI(
-            azure_endpoint=self.azure_endpoint,
-            api_key=self.api_key,
-            api_version=self.api_version
-        )
-        self.current_thread_id = None
+        self.client = client or assistant_client()
+        self.run_timeout = getattr(settings, 'CHAT_RUN_TIMEOUT', 60)
+        self.sessions = sessions or store_from_settings()
+        self.cache = cache or response_cache
         # System prompt for the model
         self.system_prompt = """You are an AI assistant for a Smart Hotel Management System.
             You must EXTRACT AND USE the EXACT room numbers/IDs mentioned in user messages.
@@ -119,134 +143,174 @@ class ChatInterface:
             {"role": "system", "content": self.system_prompt}
         ]
 
-    def process_text(self, message, context=None):
+    async def process_text(self, message, context=None, session_key=DEFAULT_SESSION):
+        """Answer common requests locally, everything else goes to the session's assistant thread"""
+        started = time.perf_counter()
+        action_data = parse_intent(message)
+        metrics.observe('chat.parse_seconds', time.perf_counter() - started)
+        if action_data is not None:
+            metrics.observe('chat.local_seconds', time.perf_counter() - started)
+            return action_data
+        # Messages the assistant has already read the same way skip it
+        action_data = await run_db(self.cache.get_intent, message)
+        if action_data is not None:
+            metrics.observe('chat.cached_seconds', time.perf_counter() - started)
+            return action_data
         try:
-            if not self.current_thread_id:
-                logger.info("Creating new thread")
-                thread = self.client.beta.threads.create()
-                self.current_thread_id = thread.id
-                logger.info(f"Created thread: {self.current_thread_id}")
-
-                # Add the system prompt to the thread
-                logger.info("Adding system prompt to thread")
-                self.client.beta.threads.messages.create(
-                    thread_id=self.current_thread_id,
-                    role="assistant",
-                    content=self.system_prompt
-                )
-            else:
-                logger.info(f"Using existing thread: {self.current_thread_id}")
-
-            # Add user's message to the thread
-            logger.info(f"Adding message to thread: {message}")
-            self.client.beta.threads.messages.create(
-                thread_id=self.current_thread_id,
-                role="user",
-                content=message
-            )
-
-            # Run the assistant
-            logger.info("Starting assistant run")
-            run = self.client.beta.threads.runs.create(
-                thread_id=self.current_thread_id,
-                assistant_id=self.assistant_id
-            )
-            logger.info(f"Created run: {run.id}")
+            # Session lookups may hit Redis, so they run on the pool rather than the event loop
+            session = await run_db(self.sessions.get, session_key)
+            action_data = await self.ask_assistant(message, session)
+            if isinstance(action_data, dict):
+                await run_db(self.cache.set_intent, message, action_data)
+            return action_data
+        finally:
+            metrics.observe('chat.assistant_seconds', time.perf_counter() - started)
 
-            # Wait for completion
-            while run.status in ["queued", "in_progress"]:
-                run = self.client.beta.threads.runs.retrieve(
-                    thread_id=self.current_thread_id,
-                    run_id=run.id
+    async def ask_assistant(self, message, session):
+        try:
+            async with session.lock:
+                if not session.thread_id:
+                    thread = await self.client.beta.threads.create()
+                    session.thread_id = thread.id
+                    await run_db(self.sessions.save, session)
+                    logger.info(f"Created thread: {session.thread_id}")
+                    await self.client.beta.threads.messages.create(
+                        thread_id=session.thread_id,
+                        role="assistant",
+                        content=self.system_prompt
+                    )
+
+                await self.client.beta.threads.messages.create(
+                    thread_id=session.thread_id,
+                    role="user",
+                    content=message
+                )
+                run = await self.client.beta.threads.runs.create(
+                    thread_id=session.thread_id,
+                    assistant_id=self.assistant_id
                 )
-                logger.info(f"Run status: {run.status}")
-                time.sleep(0.5)
-
-            if run.status == "completed":
-                # Get the messages
-                logger.info("Run completed, retrieving messages")
-                messages = self.client.beta.threads.messages.list(
-                    thread_id=self.current_thread_id
+                logger.info(f"Created run: {run.id}")
+                run = await self.wait_for_run(session.thread_id, run)
+
+                if run.status != "completed":
+                    logger.error(f"Run failed with status: {run.status}")
+                    return f"Assistant run failed with status: {run.status}"
+
+                # Only the reply of this run is needed, not the whole thread
+                messages = await self.client.beta.threads.messages.list(
+                    thread_id=session.thread_id,
+                    run_id=run.id,
+                    order="desc",
+                    limit=1
                 )
-                
-                # Get the latest assistant message
-                found_message = False
-                for msg in messages.data:
-                    if msg.role == "assistant":
-                        found_message = True
-                        logger.info(f"msg.content type: {type(msg.content)}, value: {msg.content}")
-                        
-                        if isinstance(msg.content, list):
-                            content = ''.join([
-                                part.text.value if hasattr(part, 'text') and hasattr(part.text, 'value') else ''
-                                for part in msg.content
-                            ])
-                        else:
-                            content = msg.content
-                        
-                        logger.info(f"Raw assistant response: {content}")
-                        
-                        # Check if content is None or empty
-                        if not content or not content.strip():
-                            logger.error("Empty response from assistant")
-                            return "Empty response from assistant"
-
-                        # Try to parse as JSON and execute action
-                        try:
-                            # Clean up content
-                            content = content.strip()
-                            if content.startswith("```json"):
-                                content = content[7:]
-                            if content.endswith("```"):
-                                content = content[:-3]
-                            content = content.strip()
-                            
-                            logger.info(f"Cleaned content for parsing: {content}")
-                            
-                            action_data = json.loads(content)
-                            logger.info(f"Successfully parsed JSON: {json.dumps(action_data, indent=2)}")
-                            
-                            # Validate the action data
-                            if not isinstance(action_data, dict):
-                                logger.error(f"Response is not a dictionary: {type(action_data)}")
-                                return "Invalid response format: not a dictionary"
-
-                            if "action" not in action_data:
-                                logger.error("Missing 'action' in response")
-                                return "Invalid response format: missing action"
-                            
-                            if action_data["action"] == "api_call":
-                                required_fields = ["method", "endpoint"]
-                                missing_fields = [field for field in required_fields if field not in action_data]
-                                if missing_fields:
-                                    logger.error(f"Missing required fields: {missing_fields}")
-                                    return f"Invalid API call format: missing {', '.join(missing_fields)}"
-                                
-                                # Initialize params if not present
-                                if "params" not in action_data:
-                                    action_data["params"] = {}
-
-                            return action_data
-                            
-                        except json.JSONDecodeError as e:
-                            logger.error(f"JSON Parse Error. Content: '{content}'. Error: {str(e)}")
-                            return "Failed to parse assistant's response as valid JSON."
-
-                if not found_message:
-                    logger.warning("No assistant message found in response")
-                    return "No response from assistant"
-            else:
-                logger.error(f"Run failed with status: {run.status}")
-                return f"Assistant run failed with status: {run.status}"
+            reply = next((msg for msg in messages.data if msg.role == "assistant"), None)
+            if reply is None:
+                logger.warning("No assistant message found in response")
+                return "No response from assistant"
+            return self.parse_reply(reply)
 
         except Exception as e:
             logger.error(f"Error in process_text: {str(e)}", exc_info=True)
             return f"Error processing message: {str(e)}"
 
+    async def wait_for_run(self, thread_id, run):
+        """Poll a run until it finishes, backing off while it's still working"""
+        delay = RUN_POLL_INITIAL
+        deadline = time.monotonic() + self.run_timeout
+        polls = 0
+        while run.status in ("queued", "in_progress"):
+            if time.monotonic() + delay > deadline:
+                logger.error(f"Run {run.id} timed out after {self.run_timeout}s, cancelling")
+                metrics.increment('chat.assistant.timeouts')
+                await self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                run.status = "expired"
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * RUN_POLL_BACKOFF, RUN_POLL_MAX)
+            run = await self.client.beta.threads.runs.retrieve(
+                thread_id=thread_id,
+                run_id=run.id
+            )
+            polls += 1
+        metrics.observe('chat.assistant.polls', polls)
+        return run
+
+    def parse_reply(self, msg):
+        """Turn an assistant message into action_data, or an error string"""
+        if isinstance(msg.content, list):
+            content = ''.join([
+                part.text.value if hasattr(part, 'text') and hasattr(part.text, 'value') else ''
+                for part in msg.content
+            ])
+        else:
+            content = msg.content
+
+        logger.info(f"Raw assistant response: {content}")
+
+        # Check if content is None or empty
+        if not content or not content.strip():
+            logger.error("Empty response from assistant")
+            return "Empty response from assistant"
+
+        # Try to parse as JSON and execute action
+        try:
+            # Clean up content
+            content = content.strip()
+            if content.startswith("```json"):
+                content = content[7:]
+            if content.endswith("```"):
+                content = content[:-3]
+            content = content.strip()
+
+            action_data = json.loads(content)
+
+            # Validate the action data
+            if not isinstance(action_data, dict):
+                logger.error(f"Response is not a dictionary: {type(action_data)}")
+                return "Invalid response format: not a dictionary"
+
+            if "action" not in action_data:
+                logger.error("Missing 'action' in response")
+                return "Invalid response format: missing action"
+
+            if action_data["action"] == "api_call":
+                required_fields = ["method", "endpoint"]
+                missing_fields = [field for field in required_fields if field not in action_data]
+                if missing_fields:
+                    logger.error(f"Missing required fields: {missing_fields}")
+                    return f"Invalid API call format: missing {', '.join(missing_fields)}"
+
+                # Initialize params if not present
+                if "params" not in action_data:
+                    action_data["params"] = {}
+
+            return action_data
+
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON Parse Error. Content: '{content}'. Error: {str(e)}")
+            return "Failed to parse assistant's response as valid JSON."
 
 
+    async def run_action(self, action_data, request=None):
+        """Execute an action from process_text, returns (action_data or error, API result)"""
+        action = action_data.get("action")
+        if action == "mqtt_publish":
+            return await run_db(self.execute_action, action_data), None
+        action_data = self.execute_action(action_data)
+        if not isinstance(action_data, dict):
+            return action_data, None
+        try:
+            result, (key, ttl) = await run_db(self.cache.get_result, action_data)
+            if result is None:
+                result = await executor.execute(action_data, request)
+                await run_db(self.cache.set_result, key, ttl, result)
+            return action_data, result
+        except ActionError as e:
+            logger.warning(f"Chat action not executed: {e}")
+            return action_data, {"status": 400, "data": {"error": str(e)}}
+
     def execute_action(self, action_data):
-        """Now just validates and returns the action data"""
+        """Validate the action data and send MQTT commands to the devices"""
         action = action_data.get("action")
 
         if action == "api_call":
@@ -266,13 +330,28 @@ class ChatInterface:
 
             if not topic or not payload:
                 return "Invalid MQTT parameters."
-
-            # Just return the validated action data
+            # The chat may only command devices, never publish sensor readings or arbitrary topics
+            match = COMMAND_TOPIC.match(topic) if isinstance(topic, str) else None
+            if match is None or not isinstance(payload, dict):
+                return "Only AC and lighting commands can be sent to devices."
+
+            # Resolve the device from the in-memory registry instead of the database
+            room_number, device_name = match.groups()
+            device_type = device_name.upper()
+            room_state = registry.get_by_number(room_number)
+            if room_state is None:
+                return f"Room {room_number} not found."
+            if room_state.device(device_type) is None:
+                return f"No {device_name} device found in room {room_number}."
+            if payload.get("status") in DeviceStatus.values:
+                set_recorded_device_status(room_state, device_type, payload["status"])
+
+            action_data["command_id"] = publish_device_commands([(topic, payload)])[0]
             return action_data
 
         return "Unsupported action type."
 
-    def clear_history(self):
-        """Reset conversation history and thread"""
-        self.current_thread_id = None
+    def clear_history(self, session_key=DEFAULT_SESSION):
+        """Reset conversation history and start a new thread for the session"""
+        self.sessions.forget(session_key)
         self.conversation_history = [{"role": "system", "content": self.system_prompt}]
@@ -0,0 +1,114 @@
+# fake_client.py
+import asyncio
+import itertools
+import json
+import time
+from types import SimpleNamespace
+
+DEFAULT_REPLY = {"action": "api_call", "method": "GET", "endpoint": "/api/energy/summary/", "params": {}}
+
+def default_responder(message):
+    return json.dumps(DEFAULT_REPLY)
+
+class FakeAssistantClient:
+    """
+    Stand-in for AsyncAzureOpenAI's Assistants API that answers locally.
+    Runs stay in progress for `latency` seconds and then complete with the
+    reply returned by responder(user_message), so the chat path can be
+    tested and load tested without Azure.
+    """
+
+    def __init__(self, latency=1.0, responder=default_responder):
+        self.latency = latency
+        self.responder = responder
+        self.ids = itertools.count(1)
+        self.threads = {}
+        self.runs = {}
+        self.calls = {}
+        self.beta = SimpleNamespace(threads=_Threads(self))
+
+    def next_id(self, prefix):
+        return f"{prefix}_{next(self.ids)}"
+
+    def count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+def _message(message_id, role, content, run_id=None):
+    text = SimpleNamespace(value=content, annotations=[])
+    return SimpleNamespace(
+        id=message_id,
+        role=role,
+        run_id=run_id,
+        content=[SimpleNamespace(type='text', text=text)]
+    )
+
+class _Threads:
+    def __init__(self, fake):
+        self.fake = fake
+        self.messages = _Messages(fake)
+        self.runs = _Runs(fake)
+
+    async def create(self, **kwargs):
+        self.fake.count('threads.create')
+        thread_id = self.fake.next_id('thread')
+        self.fake.threads[thread_id] = []
+        return SimpleNamespace(id=thread_id)
+
+class _Messages:
+    def __init__(self, fake):
+        self.fake = fake
+
+    async def create(self, thread_id, role, content, **kwargs):
+        self.fake.count('messages.create')
+        message = _message(self.fake.next_id('msg'), role, content)
+        self.fake.threads[thread_id].append(message)
+        return message
+
+    async def list(self, thread_id, run_id=None, order='desc', limit=20, **kwargs):
+        self.fake.count('messages.list')
+        messages = [
+            message for message in self.fake.threads[thread_id]
+            if run_id is None or message.run_id == run_id
+        ]
+        if order == 'desc':
+            messages = messages[::-1]
+        return SimpleNamespace(data=messages[:limit])
+
+class _Runs:
+    def __init__(self, fake):
+        self.fake = fake
+
+    async def create(self, thread_id, assistant_id=None, **kwargs):
+        self.fake.count('runs.create')
+        run = SimpleNamespace(
+            id=self.fake.next_id('run'),
+            thread_id=thread_id,
+            status='queued',
+            finishes_at=time.monotonic() + self.fake.latency
+        )
+        self.fake.runs[run.id] = run
+        return SimpleNamespace(id=run.id, status=run.status)
+
+    async def retrieve(self, thread_id, run_id, **kwargs):
+        self.fake.count('runs.retrieve')
+        # Simulate the network round trip of a poll
+        await asyncio.sleep(0)
+        run = self.fake.runs[run_id]
+        if run.status in ('queued', 'in_progress'):
+            if time.monotonic() >= run.finishes_at:
+                user_message = next(
+                    message for message in reversed(self.fake.threads[thread_id]) if message.role == 'user'
+                )
+                reply = self.fake.responder(user_message.content[0].text.value)
+                self.fake.threads[thread_id].append(
+                    _message(self.fake.next_id('msg'), 'assistant', reply, run_id=run_id)
+                )
+                run.status = 'completed'
+            else:
+                run.status = 'in_progress'
+        return SimpleNamespace(id=run.id, status=run.status)
+
+    async def cancel(self, thread_id, run_id, **kwargs):
+        self.fake.count('runs.cancel')
+        self.fake.runs[run_id].status = 'cancelled'
+        return SimpleNamespace(id=run_id, status='cancelled')
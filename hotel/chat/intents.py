@@ -0,0 +1,187 @@
+# intents.py
+import logging
+import re
+import threading
+from hotel.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ROOM = re.compile(r'\b(?:rooms?|rms?)\s*(?:numbers?\s*|no\.?\s*|#\s*)?([a-z]?\d+[a-z]?)\b', re.IGNORECASE)
+# "rooms 201 and 202", "room 201 or 202": several rooms, which only the assistant handles
+ROOM_LIST = re.compile(r'\b(?:rooms|rms)\b|\b(?:room|rm)\s*#?\s*[a-z]?\d+[a-z]?\s*(?:,|&|and|or)\s*#?\s*[a-z]?\d+', re.IGNORECASE)
+NEGATION = re.compile(r"\b(?:don'?t|do\s+not|never|not|unless)\b")
+WRITE_VERB = re.compile(r'\b(?:set|change|make|adjust|turn|switch|put|increase|decrease|raise|lower|dim)\b')
+QUESTION = re.compile(r"\?|^\s*(?:is|are|what'?s|what|how|which|who|when|does|do|can)\b")
+
+AC = re.compile(r'\b(?:ac|a/c|air\s*con(?:ditioning|ditioner)?|thermostat|temperature|heating|cooling)\b')
+# "to 50%" is a percentage, not a setpoint
+AC_TARGET = re.compile(
+    r'\b(\d{2}(?:\.\d)?)\s*(?:°\s*c?|degrees?(?:\s+c(?:elsius)?)?|c\b)'
+    r'|\b(?:to|at)\s+(\d{2}(?:\.\d)?)\b(?!\.\d|\s*(?:%|percent\b))'
+)
+# The setpoints ACControl accepts; anything else is left to the assistant
+AC_SETPOINTS = (16, 30)
+# "Turn the heating off" switches the AC off, so off is checked before the mode names
+AC_MODES = (
+    (re.compile(r'\boff\b'), 'OFF'),
+    (re.compile(r'\bcool(?:ing)?\b'), 'COOL'),
+    (re.compile(r'\bheat(?:ing)?\b'), 'HEAT'),
+    (re.compile(r'\bfan(?:\s+only)?\b'), 'FAN'),
+    (re.compile(r'\bauto(?:matic)?\b'), 'AUTO'),
+)
+
+LIGHTS = re.compile(r'\blights?\b|\blighting\b|\blamps?\b')
+BRIGHTNESS = re.compile(r'\b(\d{1,3})\s*(?:%|percent\b)')
+ON_OFF = re.compile(r'\b(on|off)\b')
+
+STATUS = re.compile(r'\bstatus\b|\bstate\b|\bhow\s+is\b|\boverview\b')
+ENERGY = re.compile(r'\benerg(?:y|ies)\b|\bpower\b|\bconsumption\b|\belectricity\b|\bkwh\b')
+DAYS = re.compile(r'\b(\d{1,3})\s*(day|week|month)s?\b')
+PERIODS = (('week', 7), ('month', 30), ('today', 1))
+PERIOD_DAYS = dict(PERIODS)
+PERIOD_DAYS['day'] = 1
+# Periods the report can't be asked for in days, left to the assistant
+OTHER_PERIODS = re.compile(r'\b(?:hours?|years?|quarters?|fortnights?|weekends?|yesterday|since)\b')
+IAQ = re.compile(
+    r'\bair\s*quality\b|\biaq\b|\bco2\b|\bhumidity\b|\btvoc\b|\bpm\s*2\.?5\b|\bnoise\b'
+    r'|\btemperature\b|\bhot\b|\bcold\b|\bstuffy\b'
+)
+PRESENCE = re.compile(
+    r'\banyone\b|\banybody\b|\bsomeone\b|\bsomebody\b|\boccupied\b|\boccupancy\b'
+    r'|\bpresence\b|\bempty\b|\bvacant\b'
+)
+
+def api_call(method, endpoint, params=None):
+    return {"action": "api_call", "method": method, "endpoint": endpoint, "params": params or {}}
+
+def room_endpoint(room, path):
+    return f"/api/rooms/by-number/{room}/{path}/"
+
+def ac_intent(text, room):
+    if room is None or not AC.search(text):
+        return None
+    params = {}
+    match = AC_TARGET.search(text)
+    if match:
+        params["temperature"] = float(match.group(1) or match.group(2))
+        if not AC_SETPOINTS[0] <= params["temperature"] <= AC_SETPOINTS[1]:
+            return None
+    for pattern, mode in AC_MODES:
+        if pattern.search(text):
+            params["mode"] = mode
+            break
+    if not params:
+        return None
+    if "temperature" in params:
+        # The assistant's examples default to cooling when only a temperature is given
+        params.setdefault("mode", "COOL")
+        if params["temperature"].is_integer():
+            params["temperature"] = int(params["temperature"])
+    return api_call("POST", room_endpoint(room, "ac/control"), params)
+
+def lights_intent(text, room):
+    if room is None or not LIGHTS.search(text):
+        return None
+    match = BRIGHTNESS.search(text)
+    if match and int(match.group(1)) <= 100:
+        payload = {"brightness": int(match.group(1))}
+    else:
+        switch = set(ON_OFF.findall(text))
+        if len(switch) != 1:
+            return None
+        payload = {"status": switch.pop().upper()}
+    return {"action": "mqtt_publish", "topic": f"hotel/room/{room}/lighting", "payload": payload}
+
+def status_intent(text, room):
+    if room is None or not STATUS.search(text):
+        return None
+    return api_call("GET", room_endpoint(room, "status"))
+
+def energy_intent(text, room):
+    if not ENERGY.search(text):
+        return None
+    if room is None:
+        return api_call("GET", "/api/energy/summary/")
+    if OTHER_PERIODS.search(text):
+        return None
+    match = DAYS.search(text)
+    if match:
+        days = int(match.group(1)) * PERIOD_DAYS[match.group(2)]
+    else:
+        days = next((period_days for period, period_days in PERIODS if period in text), 1)
+    return api_call("GET", room_endpoint(room, "energy-report"), {"days": days})
+
+def iaq_intent(text, room):
+    if room is None or not IAQ.search(text):
+        return None
+    return api_call("GET", room_endpoint(room, "data/iaq"))
+
+def presence_intent(text, room):
+    if room is None or not PRESENCE.search(text):
+        return None
+    return api_call("GET", room_endpoint(room, "data/life-being"))
+
+WRITE_INTENTS = (('ac', ac_intent), ('lights', lights_intent))
+READ_INTENTS = (
+    ('status', status_intent),
+    ('energy', energy_intent),
+    ('iaq', iaq_intent),
+    ('presence', presence_intent),
+)
+
+class IntentParser:
+    """
+    Turns the common chat requests (status, energy report, AC settings, air
+    quality, presence, lights) into the same action_data the assistant
+    would return, without a round trip. Anything ambiguous - several rooms
+    or intents, negations - returns None so the assistant handles it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, message):
+        action_data, name = self.match(message)
+        with self.lock:
+            if action_data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            hit_rate = self.hits / (self.hits + self.misses)
+        metrics.gauge('chat.intents.hit_rate', round(hit_rate, 4))
+        if action_data is None:
+            metrics.increment('chat.intents.misses')
+        else:
+            metrics.increment('chat.intents.hits')
+            metrics.increment(f'chat.intents.{name}')
+            logger.info(f"Parsed '{message}' locally as {name}")
+        return action_data
+
+    def match(self, message):
+        """(action_data, intent name) for a message, (None, None) if it isn't a clear match"""
+        if not isinstance(message, str):
+            return None, None
+        rooms = set(ROOM.findall(message))
+        if len(rooms) > 1 or ROOM_LIST.search(message):
+            return None, None
+        room = rooms.pop() if rooms else None
+        # Drop the room mention so its number can't be read as a temperature or a duration
+        text = ROOM.sub(' ', message).lower()
+        if NEGATION.search(text):
+            return None, None
+
+        # "lights off in room 201" is a command, "are the lights on in room 201?" isn't
+        command = WRITE_VERB.search(text) or (ON_OFF.search(text) and not QUESTION.search(text))
+        intents = WRITE_INTENTS if command else READ_INTENTS
+        matches = [(intent(text, room), name) for name, intent in intents]
+        matches = [(action_data, name) for action_data, name in matches if action_data is not None]
+        if len(matches) != 1:
+            return None, None
+        return matches[0]
+
+parser = IntentParser()
+
+def parse_intent(message):
+    return parser.parse(message)
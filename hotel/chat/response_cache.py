@@ -0,0 +1,135 @@
+# response_cache.py
+import hashlib
+import json
+import logging
+import re
+from urllib.parse import urlsplit
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from hotel.device_state import registry
+from hotel.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds a result stays fresh, by URL name; endpoints not listed aren't cached.
+# Room results are also dropped as soon as the room's data changes.
+RESULT_TTLS = {
+    'room-status-by-number': 15,
+    'room-iaq-data-by-number': 30,
+    'room-life-being-data-by-number': 15,
+    'room-energy-report-by-number': 300,
+    'energy-summary': 300,
+}
+INTENT_TTL = 3600
+ENERGY_SCOPE = 'energy'
+NON_WORD = re.compile(r'[^\w]+')
+
+def version_key(scope):
+    return f"chat:version:{scope}"
+
+def room_scope(room_id):
+    return f"room:{room_id}"
+
+def bump(scope):
+    """Invalidate every cached result in a scope by moving to a new version"""
+    key = version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+def room_changed(room_id):
+    bump(room_scope(room_id))
+
+def energy_changed(room_id):
+    bump(room_scope(room_id))
+    bump(ENERGY_SCOPE)
+
+def normalize(message):
+    return ' '.join(NON_WORD.sub(' ', message.lower()).split())
+
+def digest(value):
+    return hashlib.sha1(value.encode()).hexdigest()
+
+class ResponseCache:
+    """
+    Caches chat results by normalized intent. Messages the assistant turned
+    into a read-only API call are remembered, so a repeat skips the
+    assistant; results of those calls are kept per endpoint for as long as
+    the data they show stays fresh, under a per room version that is bumped
+    whenever the room's readings or devices change.
+    """
+
+    def __init__(self, result_ttls=RESULT_TTLS, intent_ttl=INTENT_TTL):
+        self.result_ttls = result_ttls
+        self.intent_ttl = intent_ttl
+
+    # Message -> action_data
+
+    def intent_key(self, message):
+        return f"chat:intent:{digest(normalize(message))}"
+
+    def get_intent(self, message):
+        action_data = cache.get(self.intent_key(message))
+        metrics.increment('chat.cache.intent_hits' if action_data is not None else 'chat.cache.intent_misses')
+        return action_data
+
+    def set_intent(self, message, action_data):
+        """Remember how the assistant read a message, if the reading doesn't depend on earlier messages"""
+        if action_data.get('action') != 'api_call' or str(action_data.get('method', '')).upper() != 'GET':
+            return
+        number = self.resolve(action_data)[1].get('number')
+        # "and the other room?" depends on the conversation, only cache messages naming the room
+        if number is not None and str(number).lower() not in normalize(message).split():
+            return
+        cache.set(self.intent_key(message), action_data, self.intent_ttl)
+
+    # action_data -> API result
+
+    @staticmethod
+    def resolve(action_data):
+        """(url name, kwargs) of an action's endpoint, (None, {}) if it doesn't resolve"""
+        try:
+            match = resolve(urlsplit(action_data.get('endpoint', '')).path)
+        except Resolver404:
+            return None, {}
+        return match.url_name, match.kwargs
+
+    def result_key(self, action_data):
+        """(cache key, ttl) for a cacheable action, (None, 0) otherwise"""
+        if action_data.get('action') != 'api_call' or str(action_data.get('method', '')).upper() != 'GET':
+            return None, 0
+        url_name, kwargs = self.resolve(action_data)
+        ttl = self.result_ttls.get(url_name, 0)
+        if not ttl:
+            return None, 0
+        if 'number' in kwargs:
+            room = registry.get_by_number(kwargs['number'])
+            if room is None:
+                return None, 0
+            scope = room_scope(room.room_id)
+        else:
+            scope = ENERGY_SCOPE
+        version = cache.get(version_key(scope), 0)
+        request = json.dumps(
+            [urlsplit(action_data['endpoint']).path, action_data.get('params') or {}], sort_keys=True
+        )
+        return f"chat:result:{scope}:{version}:{digest(request)}", ttl
+
+    def get_result(self, action_data):
+        """(cached result or None, key and ttl to store a fresh result under)"""
+        key, ttl = self.result_key(action_data)
+        if key is None:
+            return None, (None, 0)
+        result = cache.get(key)
+        metrics.increment('chat.cache.result_hits' if result is not None else 'chat.cache.result_misses')
+        return result, (key, ttl)
+
+    def set_result(self, key, ttl, result):
+        if key is not None and result.get('status') == 200:
+            cache.set(key, result, ttl)
+
+# Device and control changes of any kind go through the registry
+registry.listeners.append(room_changed)
+
+response_cache = ResponseCache()
@@ -0,0 +1,107 @@
+# sessions.py
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from hotel.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = 'chat_session'
+
+def cache_key(key):
+    return f"chat:session:{key}"
+
+def new_session_key():
+    return uuid.uuid4().hex
+
+class ChatSession:
+    __slots__ = ('key', 'thread_id', 'lock', 'last_used')
+
+    def __init__(self, key, thread_id=None):
+        self.key = key
+        self.thread_id = thread_id
+        # A thread only accepts new messages once its previous run has finished
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+class SessionStore:
+    """
+    Assistant threads per chat session, in a bounded LRU. Sessions idle for
+    longer than idle_timeout are dropped. Thread IDs are also kept in the
+    cache (Redis), so a session evicted to make room, or one whose messages
+    land on another process, picks its conversation up again.
+    """
+
+    def __init__(self, max_sessions=1000, idle_timeout=1800):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            self.expire(now)
+            session = self.sessions.get(key)
+            if session is not None:
+                self.sessions.move_to_end(key)
+                session.last_used = now
+                return session
+
+        thread_id = cache.get(cache_key(key))
+        with self.lock:
+            # Another request for the same session may have got here first
+            session = self.sessions.get(key)
+            if session is None:
+                session = self.sessions[key] = ChatSession(key, thread_id)
+                metrics.increment('chat.sessions.restored' if thread_id else 'chat.sessions.created')
+                evicted = self.evict()
+            else:
+                evicted = []
+            metrics.gauge('chat.sessions.active', len(self.sessions))
+        if evicted:
+            cache.set_many({cache_key(s.key): s.thread_id for s in evicted}, self.idle_timeout)
+        return session
+
+    def expire(self, now):
+        """Drop sessions idle for longer than idle_timeout, oldest first"""
+        expired = 0
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if now - session.last_used < self.idle_timeout:
+                break
+            self.sessions.popitem(last=False)
+            expired += 1
+        if expired:
+            metrics.increment('chat.sessions.expired', expired)
+
+    def evict(self):
+        """Remove the least recently used sessions over capacity, returns those worth spilling"""
+        evicted = []
+        while len(self.sessions) > self.max_sessions:
+            _, session = self.sessions.popitem(last=False)
+            metrics.increment('chat.sessions.evicted')
+            if session.thread_id:
+                evicted.append(session)
+        return evicted
+
+    def save(self, session):
+        """Share a session's thread with the other processes"""
+        cache.set(cache_key(session.key), session.thread_id, self.idle_timeout)
+
+    def forget(self, key):
+        with self.lock:
+            self.sessions.pop(key, None)
+            metrics.gauge('chat.sessions.active', len(self.sessions))
+        cache.delete(cache_key(key))
+
+def store_from_settings():
+    return SessionStore(
+        max_sessions=getattr(settings, 'CHAT_MAX_SESSIONS', 1000),
+        idle_timeout=getattr(settings, 'CHAT_SESSION_IDLE_SECONDS', 1800)
+    )
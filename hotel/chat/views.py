@@ -6,6 +6,7 @@ from rest_framework.permissions import AllowAny
 import json
 import base64
 from .chat_interface import ChatInterface
+from .sessions import SESSION_COOKIE, new_session_key
 
 chat_interface = ChatInterface()
 
@@ -14,22 +15,30 @@ chat_interface = ChatInterface()
 @permission_classes([AllowAny])
 def chat_home(request):
     """Render main chat interface"""
-    return render(request, 'hotel/chat/index.html', {
+    response = render(request, 'hotel/chat/index.html', {
         'initial_message': 'Welcome to Smart Hotel Assistant! How can I help you today?'
     })
+    if SESSION_COOKIE not in request.COOKIES:
+        response.set_cookie(SESSION_COOKIE, new_session_key(), httponly=True, samesite='Lax')
+    return response
 
-@api_view(['POST'])
-@csrf_exempt
-@permission_classes([AllowAny])
-def chat_message(request):
+async def chat_message(request):
     """Handle incoming chat messages"""
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    session_key = request.COOKIES.get(SESSION_COOKIE) or new_session_key()
     try:
         data = json.loads(request.body)
         message_type = data.get('type', 'text')
         room_context = data.get('context', {})
+        result = None
 
         if message_type == 'text':
-            response = chat_interface.process_text(data['message'], room_context)
+            # Awaiting the assistant doesn't hold a worker, the event loop serves other requests meanwhile
+            response = await chat_interface.process_text(data['message'], room_context, session_key)
+            if isinstance(response, dict):
+                # API calls run in process, so the reply already carries their result
+                response, result = await chat_interface.run_action(response, request)
         elif message_type == 'voice':
             audio_data = base64.b64decode(data['audio'].split(',')[1])
             response = chat_interface.process_voice_to_text(audio_data)
@@ -41,10 +50,16 @@ def chat_message(request):
         else:
             response = "Unsupported message type"
 
-        return JsonResponse({
+        body = {
             'response': response,
             'type': message_type
-        })
+        }
+        if result is not None:
+            body['result'] = result
+        response = JsonResponse(body)
+        if SESSION_COOKIE not in request.COOKIES:
+            response.set_cookie(SESSION_COOKIE, session_key, httponly=True, samesite='Lax')
+        return response
 
     except Exception as e:
         return JsonResponse({
@@ -56,7 +71,9 @@ def chat_message(request):
 @permission_classes([AllowAny])
 def clear_chat(request):
     """Clear chat history"""
-    chat_interface.clear_history()
+    session_key = request.COOKIES.get(SESSION_COOKIE)
+    if session_key:
+        chat_interface.clear_history(session_key)
     return JsonResponse({'status': 'success'})
 
 @api_view(['GET'])
@@ -67,13 +84,11 @@ def list_deployments(request):
     return JsonResponse({'deployments': deployments})
 
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def check_azure_connection(request):
+async def check_azure_connection(request):
     """Check Azure OpenAI connection"""
     try:
         # Try a simple completion to test the connection
-        response = chat_interface.process_text("Hello")
+        response = await chat_interface.process_text("Hello")
         return JsonResponse({
             'status': 'success',
             'response': response
@@ -82,4 +97,9 @@ def check_azure_connection(request):
         return JsonResponse({
             'status': 'error',
             'error': str(e)
-        })
\ No newline at end of file
+        })
+
+# Django 3.2's decorators wrap views in sync functions, which would hide the
+# coroutine, so CSRF exemption is set directly
+chat_message.csrf_exempt = True
+check_azure_connection.csrf_exempt = True
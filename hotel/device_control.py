@@ -0,0 +1,177 @@
+# device_control.py
+import logging
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .models import Room, RoomDevice, ACControl, DeviceStatus, ACMode
+from .serializers import ACControlSerializer
+from .dispatcher import dispatcher
+from .metrics import metrics
+from .device_state import registry
+
+logger = logging.getLogger(__name__)
+
+AC_SETTING_FIELDS = ['temperature', 'mode', 'fan_speed', 'humidity_control', 'target_humidity']
+
+def ac_command_topic(room_number):
+    return f"hotel/room/{room_number}/ac"
+
+def lighting_command_topic(room_number):
+    return f"hotel/room/{room_number}/lighting"
+
+def validate_ac_settings(data):
+    """Validate AC settings once for a whole batch, returns (settings, errors)"""
+    data = {field: value for field, value in data.items() if field in AC_SETTING_FIELDS}
+    if not data:
+        return None, {'settings': [f"Provide at least one of: {', '.join(AC_SETTING_FIELDS)}"]}
+
+    serializer = ACControlSerializer(data=data, partial=True)
+    if not serializer.is_valid():
+        return None, serializer.errors
+
+    # Run the model level checks once on a template instead of per row
+    try:
+        ACControl(**serializer.validated_data).clean()
+    except ValidationError as e:
+        return None, e.message_dict
+    return serializer.validated_data, None
+
+def validate_target(rooms=None, floor=None, hotel=None):
+    """Return an error message for a malformed bulk request target, or None"""
+    if rooms is not None and not isinstance(rooms, list):
+        return "Rooms must be a list of room numbers."
+    for name, value in (('Floor', floor), ('Hotel', hotel)):
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            return f"{name} must be an integer ID."
+    return None
+
+def resolve_target_rooms(rooms=None, floor=None, hotel=None):
+    """Build the room queryset for a bulk request target"""
+    queryset = Room.objects.all()
+    if rooms is not None:
+        queryset = queryset.filter(number__in=[str(number) for number in rooms])
+    if floor is not None:
+        queryset = queryset.filter(floor_id=floor)
+    if hotel is not None:
+        queryset = queryset.filter(floor__hotel_id=hotel)
+    return queryset
+
+def bulk_control_ac(rooms, ac_settings):
+    """Apply validated AC settings to every room in the queryset"""
+    now = timezone.now()
+    device_status = DeviceStatus.OFF if ac_settings.get('mode') == ACMode.OFF else DeviceStatus.ON
+    fields = list(ac_settings)
+    results = {}
+    skipped = 0
+
+    with transaction.atomic():
+        rooms = list(rooms.select_for_update().only('id', 'number'))
+        devices = {
+            device.room_id: device
+            for device in RoomDevice.objects.filter(
+                room__in=rooms, device_type='AC'
+            ).select_related('ac_control')
+        }
+
+        updated_controls, new_controls, updated_devices = [], [], []
+        for room in rooms:
+            device = devices.get(room.id)
+            if device is None:
+                results[room.id] = {
+                    'room_id': room.id,
+                    'room_number': room.number,
+                    'status': 'error',
+                    'error': f"No AC device found in room {room.number}"
+                }
+                continue
+
+            control = getattr(device, 'ac_control', None)
+            if control is None:
+                control = ACControl(device=device, **ac_settings)
+                new_controls.append(control)
+            elif any(getattr(control, field) != value for field, value in ac_settings.items()):
+                for field, value in ac_settings.items():
+                    setattr(control, field, value)
+                control.updated_at = now
+                updated_controls.append(control)
+            else:
+                skipped += 1
+
+            if device.status != device_status:
+                device.status = device_status
+                device.last_updated = now
+                updated_devices.append(device)
+            else:
+                skipped += 1
+            results[room.id] = {
+                'room_id': room.id,
+                'room_number': room.number,
+                'device_id': device.id,
+                'status': 'success',
+                'control': control
+            }
+
+        if updated_controls:
+            ACControl.objects.bulk_update(updated_controls, fields + ['updated_at'])
+        if new_controls:
+            ACControl.objects.bulk_create(new_controls)
+        if updated_devices:
+            RoomDevice.objects.bulk_update(updated_devices, ['status', 'last_updated'])
+
+        # bulk_update doesn't send post_save, tell the device state registry directly
+        for control in updated_controls:
+            registry.update(control.device.room_id, 'AC', control.device_id, updated_at=now, **ac_settings)
+        for control in new_controls:
+            registry.forget(control.device.room_id)
+        for device in updated_devices:
+            registry.update(device.room_id, 'AC', device.id, status=device_status)
+    metrics.increment('controls.writes', len(updated_controls) + len(new_controls) + len(updated_devices))
+    metrics.increment('controls.skipped_writes', skipped)
+
+    commands = []
+    for result in results.values():
+        control = result.pop('control', None)
+        if control is None:
+            continue
+        result['settings'] = {field: getattr(control, field) for field in AC_SETTING_FIELDS}
+        commands.append((
+            ac_command_topic(result['room_number']),
+            ac_command_payload(control, result['device_id'])
+        ))
+
+    publish_device_commands(commands)
+    logger.info(f"Bulk AC control applied to {len(commands)} of {len(results)} rooms")
+    return list(results.values())
+
+def set_device_status(device, device_status):
+    """Save a device status change, skipping the write when it is unchanged"""
+    if device.status == device_status:
+        metrics.increment('controls.skipped_writes')
+        return False
+    device.status = device_status
+    device.save(update_fields=['status', 'last_updated'])
+    metrics.increment('controls.writes')
+    return True
+
+def set_recorded_device_status(room_state, device_type, device_status):
+    """Like set_device_status, for a device known only by its registry record"""
+    device = room_state.device(device_type)
+    if device.status == device_status:
+        metrics.increment('controls.skipped_writes')
+        return False
+    now = timezone.now()
+    RoomDevice.objects.filter(pk=device.device_id).update(status=device_status, last_updated=now)
+    registry.update(room_state.room_id, device_type, device.device_id, status=device_status)
+    metrics.increment('controls.writes')
+    return True
+
+def ac_command_payload(control, device_id):
+    return dict({field: getattr(control, field) for field in AC_SETTING_FIELDS}, device_id=device_id)
+
+def publish_device_commands(commands):
+    """Hand (topic, payload) device commands to the MQTT command dispatcher"""
+    if not commands:
+        return []
+    command_ids = dispatcher.send_many(commands)
+    logger.info(f"Queued {len(commands)} device commands")
+    return command_ids
@@ -0,0 +1,287 @@
+# device_state.py
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from .metrics import metrics
+from .models import Room, RoomDevice
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'hotel:device-state'
+AC_FIELDS = ('temperature', 'mode', 'fan_speed', 'humidity_control', 'target_humidity')
+LIGHTING_FIELDS = ('brightness', 'color_temperature', 'motion_sensor_enabled', 'auto_dim_enabled')
+
+class ACState:
+    __slots__ = ('device_id', 'status', 'control_id') + AC_FIELDS + ('created_at', 'updated_at')
+
+class LightingState:
+    __slots__ = ('device_id', 'status', 'control_id') + LIGHTING_FIELDS + ('created_at', 'updated_at')
+
+STATE_CLASSES = {'AC': ACState, 'LIGHTING': LightingState}
+STATE_FIELDS = {'AC': AC_FIELDS, 'LIGHTING': LIGHTING_FIELDS}
+
+def control_data(state):
+    """The control as ACControlSerializer/LightingControlSerializer would render it"""
+    if state is None or state.control_id is None:
+        return None
+    data = {'id': state.control_id, 'device': state.device_id}
+    data.update((field, getattr(state, field)) for field in type(state).__slots__[3:])
+    return data
+
+class RoomState:
+    __slots__ = ('room_id', 'number', 'ac', 'lighting', 'loaded_at')
+
+    def __init__(self, room_id, number):
+        self.room_id = room_id
+        self.number = number
+        self.ac = None
+        self.lighting = None
+        self.loaded_at = time.monotonic()
+
+    def device(self, device_type):
+        if device_type == 'AC':
+            return self.ac
+        if device_type == 'LIGHTING':
+            return self.lighting
+        return None
+
+class DeviceStateRegistry:
+    """
+    Current AC and lighting state of every room, held in process memory so
+    status requests, automation passes and chat commands don't re-read the
+    controls from Postgres. Rooms are loaded from the database on first use;
+    every change is applied locally once its transaction commits and
+    broadcast over Redis pub/sub so other processes apply it too. While the
+    subscription is down the registry serves straight from the database, and
+    entries older than max_age are reloaded to pick up writes made outside
+    the application (admin bulk edits, manual SQL).
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self.states = {}
+        self.numbers = {}
+        self.device_rooms = {}
+        self.touched = {}
+        self.sequence = 0
+        self.lock = threading.Lock()
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self.connection = None
+        self.shared = None
+        self.subscribed = threading.Event()
+        self.thread = None
+        # Called with the room ID of every change made by this process
+        self.listeners = []
+
+    # Pub/sub
+
+    def start(self):
+        """Connect to Redis and start the subscriber thread, called on first use"""
+        if self.shared is not None:
+            return
+        with self.lock:
+            if self.shared is not None:
+                return
+            try:
+                from django_redis import get_redis_connection
+                self.connection = get_redis_connection('default')
+                self.shared = True
+            except (ImportError, NotImplementedError):
+                # Without Redis (e.g. the locmem test cache) there are no other processes to follow
+                self.shared = False
+                return
+        self.thread = threading.Thread(target=self.listen, name='device-state', daemon=True)
+        self.thread.start()
+
+    def listen(self):
+        while True:
+            try:
+                pubsub = self.connection.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                self.clear()
+                self.subscribed.set()
+                logger.info("Device state registry subscribed to updates")
+                for message in pubsub.listen():
+                    self.receive(message['data'])
+            except Exception as e:
+                logger.error(f"Device state subscription lost: {e}")
+            # Updates may have been missed, serve from the database until resubscribed
+            self.subscribed.clear()
+            self.clear()
+            time.sleep(1)
+
+    def receive(self, data):
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid device state message: {data!r}")
+            return
+        if message.get('origin') == self.origin:
+            return
+        if message.get('fields', {}).get('updated_at'):
+            message['fields']['updated_at'] = parse_datetime(message['fields']['updated_at'])
+        metrics.increment('device_state.received')
+        self.apply(message)
+
+    def cacheable(self):
+        self.start()
+        return not self.shared or self.subscribed.is_set()
+
+    # Reads
+
+    def get(self, room_id):
+        """RoomState for a room, None if the room doesn't exist"""
+        return self.get_many([room_id]).get(room_id)
+
+    def get_many(self, room_ids):
+        """{room_id: RoomState} for the given rooms, loading the missing ones in one go"""
+        now = time.monotonic()
+        found, missing = {}, []
+        cacheable = self.cacheable()
+        with self.lock:
+            for room_id in room_ids:
+                state = self.states.get(room_id) if cacheable else None
+                if state is not None and now - state.loaded_at < self.max_age:
+                    found[room_id] = state
+                else:
+                    missing.append(room_id)
+        metrics.increment('device_state.hits', len(found))
+        if missing:
+            metrics.increment('device_state.misses', len(missing))
+            found.update(self.load(missing, cacheable))
+        return found
+
+    def get_by_number(self, number):
+        number = str(number)
+        room_id = self.numbers.get(number)
+        if room_id is None:
+            room_id = Room.objects.filter(number=number).values_list('id', flat=True).first()
+            if room_id is None:
+                return None
+        return self.get(room_id)
+
+    def load(self, room_ids, cacheable=True):
+        """Read the given rooms from the database"""
+        sequence = self.sequence
+        states = {
+            room_id: RoomState(room_id, number)
+            for room_id, number in Room.objects.filter(pk__in=room_ids).values_list('id', 'number')
+        }
+        devices = RoomDevice.objects.filter(room_id__in=list(states), device_type__in=STATE_CLASSES).values_list(
+            'room_id', 'id', 'device_type', 'status', 'ac_control__id', 'lighting_control__id',
+            *[f'ac_control__{field}' for field in AC_FIELDS + ('created_at', 'updated_at')],
+            *[f'lighting_control__{field}' for field in LIGHTING_FIELDS + ('created_at', 'updated_at')]
+        )
+        ac_end = 6 + len(AC_FIELDS) + 2
+        for row in devices:
+            room_id, device_id, device_type, status = row[:4]
+            state = STATE_CLASSES[device_type]()
+            if device_type == 'AC':
+                control_id, values = row[4], row[6:ac_end]
+            else:
+                control_id, values = row[5], row[ac_end:]
+            state.device_id, state.status, state.control_id = device_id, status, control_id
+            for field, value in zip(type(state).__slots__[3:], values):
+                setattr(state, field, value)
+            if device_type == 'AC':
+                states[room_id].ac = state
+            else:
+                states[room_id].lighting = state
+
+        if cacheable:
+            with self.lock:
+                for room_id, state in states.items():
+                    # A change that arrived while we were reading wins over what we read
+                    if self.touched.get(room_id, -1) > sequence:
+                        continue
+                    self.states[room_id] = state
+                    self.numbers[state.number] = room_id
+                    for device in (state.ac, state.lighting):
+                        if device is not None:
+                            self.device_rooms[device.device_id] = room_id
+        return states
+
+    def room_of(self, device_id):
+        room_id = self.device_rooms.get(device_id)
+        if room_id is None:
+            room_id = RoomDevice.objects.filter(pk=device_id).values_list('room_id', flat=True).first()
+        return room_id
+
+    # Writes
+
+    def update(self, room_id, device_type, device_id=None, **fields):
+        """Record changed control fields (or the device status) once the transaction commits"""
+        message = {
+            'origin': self.origin,
+            'room': room_id,
+            'type': device_type,
+            'device': device_id,
+            'fields': fields,
+        }
+        transaction.on_commit(lambda: self.commit(message))
+
+    def forget(self, room_id):
+        """Drop a room everywhere so it is reloaded on next use"""
+        message = {'origin': self.origin, 'room': room_id, 'forget': True}
+        transaction.on_commit(lambda: self.commit(message))
+
+    def commit(self, message):
+        self.apply(message)
+        for listener in self.listeners:
+            listener(message['room'])
+        self.start()
+        if not self.shared:
+            return
+        try:
+            self.connection.publish(CHANNEL, json.dumps(message, default=str))
+            metrics.increment('device_state.published')
+        except Exception as e:
+            # Other processes would keep a stale copy, make them reload it
+            logger.error(f"Failed to publish device state for room {message['room']}: {e}")
+            metrics.increment('device_state.publish_errors')
+
+    def apply(self, message):
+        room_id = message['room']
+        with self.lock:
+            self.sequence += 1
+            self.touched[room_id] = self.sequence
+            state = self.states.get(room_id)
+            if state is None:
+                return
+            if message.get('forget'):
+                del self.states[room_id]
+                return
+            device = state.device(message['type'])
+            if device is None or (message['device'] is not None and message['device'] != device.device_id):
+                # A device or control we don't know about yet, reload the room
+                del self.states[room_id]
+                return
+            for field, value in message['fields'].items():
+                if field in device.__slots__:
+                    setattr(device, field, value)
+
+    def clear(self):
+        with self.lock:
+            self.states.clear()
+
+def record_control(control, device_type, created=False):
+    """Push a saved ACControl/LightingControl into the registry"""
+    room_id = registry.room_of(control.device_id)
+    if room_id is None:
+        return
+    if created:
+        registry.forget(room_id)
+        return
+    fields = {field: getattr(control, field) for field in STATE_FIELDS[device_type] + ('updated_at',)}
+    registry.update(room_id, device_type, control.device_id, **fields)
+
+def registry_from_settings():
+    return DeviceStateRegistry(max_age=getattr(settings, 'DEVICE_STATE_MAX_AGE', 300))
+
+registry = registry_from_settings()
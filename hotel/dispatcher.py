@@ -0,0 +1,189 @@
+# dispatcher.py
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+import paho.mqtt.client as mqtt
+from django.conf import settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ACK_TOPIC = "hotel/room/+/+/ack"
+# The only topics devices take commands on
+COMMAND_TOPIC = re.compile(r'^hotel/room/([^/+#]+)/(ac|lighting)$')
+
+def is_valid_command(topic, payload):
+    return isinstance(topic, str) and bool(COMMAND_TOPIC.match(topic)) and isinstance(payload, dict)
+
+class Command:
+    __slots__ = ('id', 'topic', 'payload', 'created_at', 'sent_at', 'attempts')
+
+    def __init__(self, topic, payload):
+        self.id = uuid.uuid4().hex
+        self.topic = topic
+        self.payload = payload
+        self.created_at = time.monotonic()
+        self.sent_at = None
+        self.attempts = 0
+
+    def message(self):
+        return json.dumps(dict(self.payload, command_id=self.id))
+
+class CommandDispatcher:
+    """
+    Publishes device commands over one persistent MQTT connection.
+
+    Commands queued for the same topic before they are sent are coalesced
+    into one (later fields win). With acks enabled, devices acknowledge by
+    publishing {"command_id": ...} to <topic>/ack; unacknowledged commands
+    are resent after ack_timeout seconds up to `retries` times, and a newer
+    command for the same device supersedes an unacknowledged older one.
+    Without acks every command is published once at QoS 1.
+    """
+
+    def __init__(self, ack_timeout=5.0, retries=2, acks=False):
+        self.acks = acks
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.queued = {}
+        self.inflight = {}
+        self.inflight_by_topic = {}
+        self.condition = threading.Condition()
+        self.client = None
+        self.thread = None
+
+    def start(self):
+        """Connect and start the publisher thread, called on first use"""
+        if self.thread is not None:
+            return
+        if hasattr(mqtt, 'CallbackAPIVersion'):
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
+        else:
+            self.client = mqtt.Client()
+        if settings.MQTT_USERNAME:
+            self.client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self.client.connect_async(settings.MQTT_BROKER, settings.MQTT_PORT, 60)
+        self.client.loop_start()
+        self.thread = threading.Thread(target=self.run, name='command-dispatcher', daemon=True)
+        self.thread.start()
+        logger.info("Command dispatcher started")
+
+    def on_connect(self, client, userdata, flags, rc):
+        if self.acks:
+            client.subscribe(ACK_TOPIC, qos=1)
+        logger.info("Command dispatcher connected to MQTT broker")
+
+    def on_message(self, client, userdata, msg):
+        try:
+            command_id = json.loads(msg.payload.decode()).get('command_id')
+        except (ValueError, AttributeError):
+            logger.warning(f"Invalid command ack on {msg.topic}")
+            return
+        with self.condition:
+            command = self.inflight.pop(command_id, None)
+            if command is None:
+                return
+            if self.inflight_by_topic.get(command.topic) is command:
+                del self.inflight_by_topic[command.topic]
+        metrics.increment('mqtt.commands.acked')
+        metrics.observe('mqtt.commands.ack_seconds', time.monotonic() - command.created_at)
+
+    def send(self, topic, payload):
+        """Queue a command for a device topic, returns the command ID"""
+        if not getattr(settings, 'MQTT_ENABLED', True):
+            return None
+        if not is_valid_command(topic, payload):
+            logger.warning(f"Rejected device command to {topic!r}: {payload!r}")
+            metrics.increment('mqtt.commands.rejected')
+            return None
+        with self.condition:
+            self.start()
+            command = self.queued.get(topic)
+            if command is not None:
+                command.payload = dict(command.payload, **payload)
+                metrics.increment('mqtt.commands.coalesced')
+            else:
+                command = self.queued[topic] = Command(topic, payload)
+            self.condition.notify()
+        return command.id
+
+    def send_many(self, commands):
+        return [self.send(topic, payload) for topic, payload in commands]
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.queued:
+                    self.condition.wait(self.next_timeout())
+                batch = list(self.queued.values())
+                self.queued.clear()
+                now = time.monotonic()
+                for command in batch if self.acks else ():
+                    older = self.inflight_by_topic.get(command.topic)
+                    if older is not None:
+                        self.inflight.pop(older.id, None)
+                        metrics.increment('mqtt.commands.superseded')
+                    self.inflight[command.id] = command
+                    self.inflight_by_topic[command.topic] = command
+                expired = [
+                    command for command in self.inflight.values()
+                    if command.sent_at is not None and now - command.sent_at >= self.ack_timeout
+                ]
+                for command in expired:
+                    if command.attempts > self.retries:
+                        del self.inflight[command.id]
+                        if self.inflight_by_topic.get(command.topic) is command:
+                            del self.inflight_by_topic[command.topic]
+                        metrics.increment('mqtt.commands.failed')
+                        logger.warning(f"No ack for command {command.id} on {command.topic} after {command.attempts} attempts")
+                resend = [command for command in expired if command.id in self.inflight]
+
+            for command in batch:
+                if self.publish(command):
+                    metrics.observe('mqtt.commands.queue_seconds', command.sent_at - command.created_at)
+            for command in resend:
+                metrics.increment('mqtt.commands.retried')
+                self.publish(command)
+
+    def next_timeout(self):
+        sent = [command.sent_at for command in self.inflight.values() if command.sent_at is not None]
+        if not sent:
+            return None
+        return max(min(sent) + self.ack_timeout - time.monotonic(), 0.05)
+
+    def publish(self, command):
+        """Send a command, returns False if it couldn't be and was dropped"""
+        command.attempts += 1
+        command.sent_at = time.monotonic()
+        try:
+            result = self.client.publish(command.topic, command.message(), qos=1)
+        except Exception as e:
+            # One bad command must not take the publisher thread, and every later command, down with it
+            logger.error(f"Dropped command {command.id} to {command.topic}: {e}")
+            with self.condition:
+                self.inflight.pop(command.id, None)
+                if self.inflight_by_topic.get(command.topic) is command:
+                    del self.inflight_by_topic[command.topic]
+            metrics.increment('mqtt.commands.failed')
+            return False
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            # Not connected yet; the retry path will send it again after the ack timeout
+            logger.warning(f"Publishing command {command.id} to {command.topic} failed with rc={result.rc}")
+        metrics.increment('mqtt.commands.published')
+        return True
+
+    def pending(self):
+        with self.condition:
+            return {'queued': len(self.queued), 'inflight': len(self.inflight)}
+
+dispatcher = CommandDispatcher(
+    ack_timeout=getattr(settings, 'MQTT_COMMAND_ACK_TIMEOUT', 5.0),
+    retries=getattr(settings, 'MQTT_COMMAND_RETRIES', 2),
+    acks=getattr(settings, 'MQTT_COMMAND_ACKS', False)
+)
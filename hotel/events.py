@@ -5,6 +5,7 @@ import logging
 import threading
 from django.conf import settings
 from hotel.models import Room, IAQSensorData, LifeBeingSensorData
+from hotel.occupancy import tracker
 from django.db.models import ObjectDoesNotExist
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,8 @@ class EventStream:
         self.client = mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
+        self.occupancy = tracker
+        self.occupancy.start()
 
         try:
             self.client.connect(
@@ -96,24 +99,11 @@ class EventStream:
                 sensitivity=data.get('sensitivity', 0.5),
                 online_status=data.get('online_status', True)
             )
+            # Occupancy is updated by the post_save signal, as for readings posted over HTTP
             logger.info(f"Life Being data saved for room {room.id}")
 
-            # Update room occupancy status
-            self.update_room_occupancy(room, data)
-
         except Exception as e:
             logger.error(f"Error saving Life Being data: {e}")
 
-    def update_room_occupancy(self, room, data):
-        """Update room occupancy status"""
-        try:
-            is_occupied = data.get('presence_detected', False)
-            if room.is_occupied != is_occupied:
-                room.is_occupied = is_occupied
-                room.save()
-                logger.info(f"Updated room {room.id} occupancy to {is_occupied}")
-        except Exception as e:
-            logger.error(f"Error updating room occupancy: {e}")
-
 if __name__ == '__main__':
     EventStream()
\ No newline at end of file
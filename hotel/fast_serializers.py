@@ -0,0 +1,113 @@
+# fast_serializers.py
+from decimal import Decimal
+from django.db import models
+from django.utils import timezone
+from .models import EnergyConsumption, IAQSensorData, LifeBeingSensorData
+from .serializers import (
+    EnergyConsumptionSerializer,
+    IAQSensorDataSerializer,
+    LifeBeingSensorDataSerializer
+)
+
+def _datetime_converter(field):
+    """Match DRF's DateTimeField output in the current timezone"""
+    def bind(tz):
+        def convert(value):
+            if value.tzinfo is not None:
+                value = value.astimezone(tz)
+            value = value.isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return convert
+    return bind
+
+def _date_converter(field):
+    return lambda tz: lambda value: value.isoformat()
+
+def _decimal_converter(field):
+    """Match DRF's DecimalField output (quantized string)"""
+    quantum = Decimal(1).scaleb(-field.decimal_places)
+    return lambda tz: lambda value: str(value.quantize(quantum))
+
+def _converter_for(field):
+    if isinstance(field, models.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, models.DateField):
+        return _date_converter(field)
+    if isinstance(field, models.DecimalField):
+        return _decimal_converter(field)
+    return None
+
+class ValuesSerializer:
+    """
+    Read-only serializer that works on values_list tuples instead of model
+    instances. The column mapping is compiled once from the model meta, so
+    per row work is a zip plus a handful of conversions.
+    """
+
+    def __init__(self, model, fields, computed=None):
+        self.model = model
+        self.fields = list(fields)
+        self.computed = computed or {}
+
+        columns = []
+        converters = []
+        for name in self.fields:
+            if name in self.computed:
+                continue
+            field = model._meta.get_field(name)
+            columns.append(field.attname)
+            converter = _converter_for(field)
+            if converter is not None:
+                converters.append((name, len(columns) - 1, converter))
+
+        self.names = [name for name in self.fields if name not in self.computed]
+        self.columns = columns
+        self.converters = converters
+        self.computed_plan = [
+            (name, function, [self.names.index(source) for source in sources])
+            for name, (function, sources) in self.computed.items()
+        ]
+
+    def values(self, queryset):
+        """Restrict a queryset to the tuples this serializer needs"""
+        return queryset.values_list(*self.columns)
+
+    def to_representation(self, rows):
+        """Turn values_list tuples (or a queryset) into JSON ready dicts"""
+        if isinstance(rows, models.QuerySet) and rows._iterable_class is not models.query.ValuesListIterable:
+            rows = self.values(rows)
+
+        # Resolve the timezone once per call rather than once per value
+        tz = timezone.get_current_timezone()
+        names = self.names
+        converters = [(name, index, bind(tz)) for name, index, bind in self.converters]
+        computed_plan = self.computed_plan
+        data = []
+        append = data.append
+        for row in rows:
+            item = dict(zip(names, row))
+            for name, index, converter in converters:
+                value = row[index]
+                if value is not None:
+                    item[name] = converter(value)
+            for name, function, indexes in computed_plan:
+                item[name] = function(*[row[index] for index in indexes])
+            append(item)
+        return data
+
+def _energy_consumed(power_usage, duration):
+    return (power_usage * duration) / (60 * 1000)
+
+iaq_sensor_data_reader = ValuesSerializer(
+    IAQSensorData, IAQSensorDataSerializer.Meta.fields
+)
+life_being_sensor_data_reader = ValuesSerializer(
+    LifeBeingSensorData, LifeBeingSensorDataSerializer.Meta.fields
+)
+energy_consumption_reader = ValuesSerializer(
+    EnergyConsumption,
+    EnergyConsumptionSerializer.Meta.fields,
+    computed={'energy_consumed': (_energy_consumed, ('power_usage', 'duration'))}
+)
@@ -0,0 +1,182 @@
+# hotel/management/commands/benchmark_chat.py
+
+import asyncio
+import json
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.urls import reverse
+from hotel.models import Hotel, Floor, Room, RoomDevice, ACControl, IAQSensorData, LifeBeingSensorData
+from hotel.metrics import metrics, Summary
+from hotel.chat import views as chat_views
+from hotel.chat.chat_interface import ChatInterface
+from hotel.chat.fake_client import FakeAssistantClient
+from hotel.chat.intents import ROOM, parse_intent
+from hotel.chat.response_cache import ResponseCache
+from hotel.chat.sessions import SessionStore
+
+# Answered by the local intent parser
+LOCAL_MESSAGES = (
+    "What's the status of room {room}?",
+    "Show me the air quality in room {room}",
+    "Energy report for room {room} over the last 7 days",
+    "Is anyone in room {room}?",
+)
+# Left to the (fake) assistant
+ASSISTANT_MESSAGES = (
+    "Give me a rundown of room {room}",
+    "Anything I should know about room {room}?",
+    "Which rooms need attention first?",
+)
+STAGES = (
+    ('parse', 'chat.parse_seconds'),
+    ('cached intent', 'chat.cached_seconds'),
+    ('assistant wait', 'chat.assistant_seconds'),
+    ('action', 'chat.actions.seconds'),
+)
+
+def fake_responder(message):
+    """Read the room status when the message names a room, the energy summary otherwise"""
+    match = ROOM.search(message)
+    if match:
+        endpoint = f"/api/rooms/by-number/{match.group(1)}/status/"
+    else:
+        endpoint = "/api/energy/summary/"
+    return json.dumps({"action": "api_call", "method": "GET", "endpoint": endpoint, "params": {}})
+
+class UncachedResponses(ResponseCache):
+    """Never hits, so every message and action takes the full path"""
+
+    def get_intent(self, message):
+        return None
+
+    def set_intent(self, message, action_data):
+        pass
+
+    def get_result(self, action_data):
+        return None, (None, 0)
+
+    def set_result(self, key, ttl, result):
+        pass
+
+class Command(BaseCommand):
+    help = 'Measure chat latency and throughput against a fake assistant (benchmark data is deleted afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20, help='Simultaneous chat sessions')
+        parser.add_argument('--latency', type=float, default=1.0, help='Seconds the fake assistant takes per run')
+        parser.add_argument('--assistant-share', type=float, default=0.3,
+                            help='Fraction of messages the local parser cannot answer')
+        parser.add_argument('--rooms', type=int, default=50)
+        parser.add_argument('--no-cache', action='store_true', help='Bypass the chat response cache')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.check_templates()
+        random.seed(options['seed'])
+        hotel, numbers = self.build_rooms(options['rooms'])
+        fake = FakeAssistantClient(latency=options['latency'], responder=fake_responder)
+        original = chat_views.chat_interface
+        chat_views.chat_interface = ChatInterface(
+            client=fake,
+            sessions=SessionStore(max_sessions=max(options['concurrency'], 1)),
+            cache=UncachedResponses() if options['no_cache'] else None
+        )
+        metrics.reset()
+        try:
+            messages = self.build_messages(numbers, options)
+            started = time.perf_counter()
+            latencies, errors = asyncio.run(self.run(messages, options['concurrency']))
+            elapsed = time.perf_counter() - started
+        finally:
+            chat_views.chat_interface = original
+            hotel.delete()
+
+        self.report(latencies, errors, elapsed, fake)
+
+    def check_templates(self):
+        """The traffic mix is only what --assistant-share says if the parser sorts the templates as expected"""
+        for template in ASSISTANT_MESSAGES:
+            if parse_intent(template.format(room='C000')) is not None:
+                raise CommandError(f"Assistant message is answered locally: {template!r}")
+        for template in LOCAL_MESSAGES:
+            if parse_intent(template.format(room='C000')) is None:
+                raise CommandError(f"Local message isn't parsed: {template!r}")
+
+    def build_rooms(self, count):
+        # The chat path queries from its own threads, so the data has to be committed
+        self.stdout.write('Creating benchmark data...')
+        hotel = Hotel.objects.create(name='Chat Benchmark Hotel')
+        floor = Floor.objects.create(hotel=hotel, number=1000)
+        numbers = []
+        for index in range(count):
+            room = Room.objects.create(floor=floor, number=f'C{index:03d}')
+            device = RoomDevice.objects.create(room=room, device_type='AC', name='Benchmark AC', status='ON')
+            ACControl.objects.create(device=device, mode='COOL', temperature=23)
+            IAQSensorData.objects.create(room=room, temperature=23, humidity=45, co2=600)
+            LifeBeingSensorData.objects.create(room=room, presence_detected=index % 2 == 0)
+            numbers.append(room.number)
+        return hotel, numbers
+
+    def build_messages(self, numbers, options):
+        messages = []
+        for _ in range(options['requests']):
+            if random.random() < options['assistant_share']:
+                template = random.choice(ASSISTANT_MESSAGES)
+            else:
+                template = random.choice(LOCAL_MESSAGES)
+            messages.append(template.format(room=random.choice(numbers)))
+        return messages
+
+    async def run(self, messages, concurrency):
+        url = reverse('chat:chat-message')
+        pending = iter(messages)
+        latencies = []
+        errors = []
+
+        async def session():
+            # One client per session, so each keeps its own chat_session cookie and assistant thread
+            client = AsyncClient()
+            for message in pending:
+                started = time.perf_counter()
+                response = await client.post(
+                    url, json.dumps({'type': 'text', 'message': message}), content_type='application/json'
+                )
+                latencies.append(time.perf_counter() - started)
+                result = response.json().get('result') if response.status_code == 200 else None
+                if result is None or result['status'] != 200:
+                    errors.append((message, response.status_code, result))
+
+        await asyncio.gather(*(session() for _ in range(max(concurrency, 1))))
+        return latencies, errors
+
+    def report(self, latencies, errors, elapsed, fake):
+        total = Summary(size=max(len(latencies), 1))
+        for latency in latencies:
+            total.observe(latency)
+        snapshot = metrics.snapshot()
+
+        self.stdout.write(
+            f"\n{len(latencies)} requests in {elapsed:.2f} s: {len(latencies) / elapsed:.1f} req/s, "
+            f"{len(errors)} errors"
+        )
+        self.stdout.write(f"\n  {'stage':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        rows = [('end to end', total.snapshot())]
+        rows += [(name, snapshot['summaries'][metric]) for name, metric in STAGES if metric in snapshot['summaries']]
+        for name, summary in rows:
+            self.stdout.write(
+                f"  {name:<16}{summary['count']:>7}"
+                + ''.join(f"{summary[p] * 1000:>10.2f}" for p in ('p50', 'p95', 'p99'))
+            )
+
+        counters = snapshot['counters']
+        self.stdout.write(
+            f"\n  local parses {counters.get('chat.intents.hits', 0)}, "
+            f"assistant runs {fake.calls.get('runs.create', 0)} ({fake.calls.get('runs.retrieve', 0)} polls), "
+            f"intent cache hits {counters.get('chat.cache.intent_hits', 0)}, "
+            f"result cache hits {counters.get('chat.cache.result_hits', 0)}"
+        )
+        for message, status_code, result in errors[:5]:
+            self.stdout.write(f"  error {status_code}: {message!r} -> {result}")
@@ -0,0 +1,99 @@
+# hotel/management/commands/benchmark_renderers.py
+
+import gzip
+import time
+from random import uniform
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from hotel.models import Hotel, Floor, Room, RoomDevice, ACControl, IAQSensorData
+from hotel.serializers import DetailedHotelSerializer
+from hotel.fast_serializers import iaq_sensor_data_reader
+from hotel.renderers import FastJSONRenderer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class Command(BaseCommand):
+    help = 'Compare the default and fast JSON renderers on large payloads (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='IAQ rows in the sensor list payload')
+        parser.add_argument('--floors', type=int, default=10)
+        parser.add_argument('--rooms-per-floor', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            payloads = self.build_payloads(options)
+            transaction.set_rollback(True)
+
+        renderers = [('JSONRenderer', JSONRenderer()), ('FastJSONRenderer', FastJSONRenderer())]
+        for name, data in payloads:
+            self.stdout.write(f'\n{name}')
+            for renderer_name, renderer in renderers:
+                duration, body = self.measure(renderer, data, options['repeat'])
+                self.stdout.write(
+                    f"  {renderer_name:<18}{duration * 1000:>9.1f} ms"
+                    f"{len(body) / duration / 1e6:>9.1f} MB/s"
+                )
+            self.report_compression(body)
+
+    def measure(self, renderer, data, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = renderer.render(data, 'application/json', {})
+            duration = time.perf_counter() - start
+            best = duration if best is None else min(best, duration)
+        return best, body
+
+    def report_compression(self, body):
+        self.stdout.write(f"  {'identity':<18}{len(body):>12,} bytes")
+        start = time.perf_counter()
+        compressed = gzip.compress(body, compresslevel=6, mtime=0)
+        self.stdout.write(
+            f"  {'gzip -6':<18}{len(compressed):>12,} bytes {(time.perf_counter() - start) * 1000:>8.1f} ms"
+        )
+        if brotli is not None:
+            start = time.perf_counter()
+            compressed = brotli.compress(body, quality=5)
+            self.stdout.write(
+                f"  {'brotli q5':<18}{len(compressed):>12,} bytes {(time.perf_counter() - start) * 1000:>8.1f} ms"
+            )
+
+    def build_payloads(self, options):
+        self.stdout.write('Creating benchmark data...')
+        hotel = Hotel.objects.create(name='Benchmark Hotel')
+        rooms = []
+        for floor_number in range(options['floors']):
+            floor = Floor.objects.create(hotel=hotel, number=1000 + floor_number)
+            for room_number in range(options['rooms_per_floor']):
+                rooms.append(Room.objects.create(floor=floor, number=f'B{floor_number}{room_number:03d}'))
+
+        for room in rooms:
+            device = RoomDevice.objects.create(room=room, device_type='AC', name='Benchmark AC', status='ON')
+            ACControl.objects.create(device=device, mode='COOL', temperature=23)
+        IAQSensorData.objects.bulk_create((
+            IAQSensorData(
+                room=rooms[i % len(rooms)],
+                temperature=uniform(18, 26),
+                humidity=uniform(30, 70),
+                co2=uniform(400, 1000),
+                tvoc=uniform(0, 1),
+                pm25=uniform(0, 100),
+                noise=uniform(30, 60),
+                illuminance=uniform(100, 1000)
+            ) for i in range(options['rows'])
+        ), batch_size=5000)
+
+        sensor_list = iaq_sensor_data_reader.to_representation(
+            IAQSensorData.objects.filter(room__floor__hotel=hotel)
+        )
+        snapshot = DetailedHotelSerializer(hotel).data
+        return [
+            (f'IAQ sensor list ({len(sensor_list)} rows)', sensor_list),
+            (f'Hotel snapshot ({len(rooms)} rooms)', snapshot),
+        ]
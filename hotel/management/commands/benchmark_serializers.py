@@ -0,0 +1,100 @@
+# hotel/management/commands/benchmark_serializers.py
+
+import time
+from random import uniform
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from hotel.models import (
+    Hotel,
+    Floor,
+    Room,
+    RoomDevice,
+    EnergyConsumption,
+    IAQSensorData,
+    LifeBeingSensorData
+)
+from hotel.serializers import (
+    EnergyConsumptionSerializer,
+    IAQSensorDataSerializer,
+    LifeBeingSensorDataSerializer
+)
+from hotel.fast_serializers import (
+    energy_consumption_reader,
+    iaq_sensor_data_reader,
+    life_being_sensor_data_reader
+)
+
+class Command(BaseCommand):
+    help = 'Compare rows/s of the ModelSerializers and the values_list readers (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            room, device = self.create_fixtures(rows, options['batch_size'])
+            cases = [
+                ('IAQSensorData', IAQSensorData.objects.filter(room=room),
+                 IAQSensorDataSerializer, iaq_sensor_data_reader),
+                ('LifeBeingSensorData', LifeBeingSensorData.objects.filter(room=room),
+                 LifeBeingSensorDataSerializer, life_being_sensor_data_reader),
+                ('EnergyConsumption', EnergyConsumption.objects.filter(room=room),
+                 EnergyConsumptionSerializer, energy_consumption_reader),
+            ]
+
+            self.stdout.write(f"{'model':<22}{'ModelSerializer':>18}{'values reader':>18}{'speedup':>10}")
+            for name, queryset, serializer_class, reader in cases:
+                slow = self.measure(lambda: serializer_class(queryset.all(), many=True).data)
+                fast = self.measure(lambda: reader.to_representation(queryset.all()))
+                self.stdout.write(
+                    f"{name:<22}{rows / slow:>14,.0f} r/s{rows / fast:>14,.0f} r/s{slow / fast:>9.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def measure(self, function):
+        start = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - start
+        assert len(result) > 0
+        return duration
+
+    def create_fixtures(self, rows, batch_size):
+        self.stdout.write(f'Creating {rows} rows per model...')
+        hotel = Hotel.objects.create(name='Benchmark Hotel')
+        floor = Floor.objects.create(hotel=hotel, number=999)
+        room = Room.objects.create(floor=floor, number='BENCH')
+        device = RoomDevice.objects.create(room=room, device_type='AC', name='Benchmark AC', status='ON')
+
+        IAQSensorData.objects.bulk_create((
+            IAQSensorData(
+                room=room,
+                temperature=uniform(18, 26),
+                humidity=uniform(30, 70),
+                co2=uniform(400, 1000),
+                tvoc=uniform(0, 1),
+                pm25=uniform(0, 100),
+                noise=uniform(30, 60),
+                illuminance=uniform(100, 1000)
+            ) for _ in range(rows)
+        ), batch_size=batch_size)
+        LifeBeingSensorData.objects.bulk_create((
+            LifeBeingSensorData(
+                room=room,
+                presence_detected=True,
+                motion_level=50,
+                presence_state='occupied',
+                sensitivity=0.8
+            ) for _ in range(rows)
+        ), batch_size=batch_size)
+        EnergyConsumption.objects.bulk_create((
+            EnergyConsumption(
+                room=room,
+                device=device,
+                power_usage=uniform(100, 500),
+                duration=60,
+                cost=uniform(1, 5)
+            ) for _ in range(rows)
+        ), batch_size=batch_size)
+        return room, device
@@ -0,0 +1,17 @@
+# hotel/management/commands/rebuild_statistics.py
+
+from django.core.management.base import BaseCommand
+from hotel.models import Hotel, Floor
+from hotel.statistics import rebuild_floor_statistics, rebuild_hotel_statistics
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed hotel and floor statistics from scratch'
+
+    def handle(self, *args, **options):
+        for hotel in Hotel.objects.all():
+            rebuild_hotel_statistics(hotel)
+            self.stdout.write(f'Rebuilt statistics for hotel {hotel.name}')
+        for floor in Floor.objects.select_related('hotel'):
+            rebuild_floor_statistics(floor)
+            self.stdout.write(f'Rebuilt statistics for {floor}')
+        self.stdout.write(self.style.SUCCESS('Statistics rebuilt.'))
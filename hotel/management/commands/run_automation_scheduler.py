@@ -0,0 +1,30 @@
+# hotel/management/commands/run_automation_scheduler.py
+
+import time
+from django.core.management.base import BaseCommand
+from hotel.scheduler import scheduler_from_settings
+
+class Command(BaseCommand):
+    help = 'Run periodic automation for all rooms; start one per replica, floors are shared out between them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, help='Seconds between cycles (AUTOMATION_INTERVAL_SECONDS)')
+        parser.add_argument('--worker-id', help='Lease owner name, defaults to host:pid')
+        parser.add_argument('--once', action='store_true', help='Run the current cycle and exit')
+
+    def handle(self, *args, **options):
+        kwargs = {'worker_id': options['worker_id']}
+        if options['interval']:
+            kwargs['interval'] = options['interval']
+        scheduler = scheduler_from_settings(**kwargs)
+
+        if options['once']:
+            summary = scheduler.run_cycle(int(time.time() // scheduler.interval))
+            self.stdout.write(self.style.SUCCESS(f'Cycle finished: {summary}'))
+            return
+
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            scheduler.stop()
+            self.stdout.write('Automation scheduler stopped.')
@@ -0,0 +1,100 @@
+# metrics.py
+import threading
+import time
+from collections import deque
+from django.core.cache import cache
+
+# Processes that publish their metrics, e.g. scheduler replicas, and when their snapshot expires
+PROCESSES_KEY = 'metrics:processes'
+
+class Summary:
+    """Count, sum, max and last value, plus a bounded sample for percentiles"""
+
+    def __init__(self, size=1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = None
+        self.last = None
+        self.samples = deque(maxlen=size)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = value if self.max is None else max(self.max, value)
+        self.last = value
+        self.samples.append(value)
+
+    def percentile(self, percent):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else None,
+            'max': self.max,
+            'last': self.last,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+class MetricsRegistry:
+    """Process local counters, gauges and summaries"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.summaries = {}
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self.lock:
+            summary = self.summaries.get(name)
+            if summary is None:
+                summary = self.summaries[name] = Summary()
+            summary.observe(value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'summaries': {name: summary.snapshot() for name, summary in self.summaries.items()},
+            }
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.summaries.clear()
+
+metrics = MetricsRegistry()
+
+def process_key(process):
+    return f"metrics:process:{process}"
+
+def publish(process, ttl):
+    """Share this process's metrics with the web processes for ttl seconds"""
+    cache.set(process_key(process), metrics.snapshot(), ttl)
+    now = time.time()
+    # Replicas racing on the index only drop each other until their next publish
+    processes = {name: expires for name, expires in (cache.get(PROCESSES_KEY) or {}).items() if expires > now}
+    processes[process] = now + ttl
+    cache.set(PROCESSES_KEY, processes, None)
+
+def published():
+    """Snapshots published by other processes, by process name"""
+    processes = cache.get(PROCESSES_KEY) or {}
+    snapshots = cache.get_many([process_key(process) for process in processes])
+    return {process: snapshots[process_key(process)] for process in processes if process_key(process) in snapshots}
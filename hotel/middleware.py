@@ -1,21 +1,68 @@
 import time
 import json
+import gzip
 import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.cache import patch_vary_headers
 from django.utils import timezone
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from rest_framework import status
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
-class RequestLoggingMiddleware:
-    """Middleware to log all requests and responses"""
-    
+class HybridMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so
+    async views are not pushed onto a thread by our own middleware.
+    Subclasses implement before() and after() instead of __call__.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self.before(request)
+        response = self.get_response(request)
+        return self.after(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.before(request)
+        response = await self.get_response(request)
+        return self.after(request, response, state)
+
+    def before(self, request):
+        return None
+
+    def after(self, request, response, state):
+        return response
+
+    def describe_user(self, request):
+        """str(request.user), without triggering a database lookup in async mode"""
+        user = getattr(request, 'user', None)
+        if self.async_mode and isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            return 'unresolved'
+        return str(user)
+
+class RequestLoggingMiddleware(HybridMiddleware):
+    """Middleware to log all requests and responses"""
+
+    def before(self, request):
         # Start time of request
         start_time = time.time()
         
@@ -25,10 +72,9 @@ class RequestLoggingMiddleware:
 
         # Log request
         self.log_request(request)
+        return start_time
 
-        # Get response
-        response = self.get_response(request)
-
+    def after(self, request, response, start_time):
         # Calculate request duration
         duration = time.time() - start_time
 
@@ -45,7 +91,7 @@ class RequestLoggingMiddleware:
                 'request_id': request.request_id,
                 'method': request.method,
                 'path': request.path,
-                'user': str(request.user),
+                'user': self.describe_user(request),
                 'ip': self.get_client_ip(request)
             }
 
@@ -82,14 +128,8 @@ class RequestLoggingMiddleware:
             return x_forwarded_for.split(',')[0]
         return request.META.get('REMOTE_ADDR')
 
-class ErrorHandlingMiddleware:
+class ErrorHandlingMiddleware(HybridMiddleware):
     """Middleware to handle exceptions and return appropriate responses"""
-    
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        return self.get_response(request)
 
     def process_exception(self, request, exception):
         """Process exceptions and return appropriate responses"""
@@ -145,16 +185,17 @@ class ErrorHandlingMiddleware:
 
         return JsonResponse(error_response, status=status_code)
 
-class PerformanceMonitoringMiddleware:
+class PerformanceMonitoringMiddleware(HybridMiddleware):
     """Middleware to monitor and log performance metrics"""
     
     def __init__(self, get_response):
-        self.get_response = get_response
+        super().__init__(get_response)
         self.slowest_threshold = 1.0  # seconds
 
-    def __call__(self, request):
-        start_time = time.time()
-        response = self.get_response(request)
+    def before(self, request):
+        return time.time()
+
+    def after(self, request, response, start_time):
         duration = time.time() - start_time
 
         # Log slow requests
@@ -173,7 +214,7 @@ class PerformanceMonitoringMiddleware:
             'duration': f"{duration:.3f}s",
             'method': request.method,
             'path': request.path,
-            'user': str(request.user),
+            'user': self.describe_user(request),
             'ip': self.get_client_ip(request)
         }
         logger.warning(f"Slow request detected: {json.dumps(log_data)}")
@@ -183,4 +224,103 @@ class PerformanceMonitoringMiddleware:
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
             return x_forwarded_for.split(',')[0]
-        return request.META.get('REMOTE_ADDR')
\ No newline at end of file
+        return request.META.get('REMOTE_ADDR')
+
+class CompressionMiddleware(HybridMiddleware):
+    """
+    Compress responses above a size threshold with the best encoding the
+    client accepts (brotli when available, then gzip).
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024)
+        self.gzip_level = getattr(settings, 'RESPONSE_COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = getattr(settings, 'RESPONSE_COMPRESSION_BROTLI_QUALITY', 5)
+
+    def after(self, request, response, state):
+        return self.compress_response(request, response)
+
+    def compress_response(self, request, response):
+        """Compress the response body in place if it is worth it"""
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_size:
+            return response
+
+        encoding = self.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        elif encoding == 'gzip':
+            compressed = gzip.compress(response.content, compresslevel=self.gzip_level, mtime=0)
+        else:
+            return response
+
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+
+        # The body changed, so a strong ETag no longer matches it byte for byte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def negotiate(self, accept_encoding):
+        """Pick an encoding from an Accept-Encoding header, honouring q=0"""
+        accepted = {}
+        for part in accept_encoding.split(','):
+            coding, _, params = part.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if coding:
+                accepted[coding.strip().lower()] = quality
+
+        candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+        candidates = [
+            coding for coding in candidates
+            if accepted.get(coding, accepted.get('*', 0.0)) > 0
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda coding: accepted.get(coding, accepted.get('*', 0.0)))
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise only ships a sync middleware, which under ASGI would route
+    every request through Django's single sync thread. This variant serves
+    static files from a worker thread and passes everything else straight on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
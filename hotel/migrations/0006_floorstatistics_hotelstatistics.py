@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0005_auto_20241119_1630'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_floors', models.IntegerField(default=0)),
+                ('total_rooms', models.IntegerField(default=0)),
+                ('occupied_rooms', models.IntegerField(default=0)),
+                ('online_sensors', models.IntegerField(default=0)),
+                ('power_usage_sum', models.FloatField(default=0.0)),
+                ('power_usage_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hotel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='hotel.hotel')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FloorStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_rooms', models.IntegerField(default=0)),
+                ('occupied_rooms', models.IntegerField(default=0)),
+                ('online_sensors', models.IntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0.0)),
+                ('temperature_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('floor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='hotel.floor')),
+            ],
+        ),
+    ]
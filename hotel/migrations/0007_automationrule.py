@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 17:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0006_floorstatistics_hotelstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutomationRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('metric', models.CharField(choices=[('temperature', 'temperature'), ('humidity', 'humidity'), ('co2', 'co2'), ('tvoc', 'tvoc'), ('pm25', 'pm25'), ('noise', 'noise'), ('illuminance', 'illuminance')], max_length=20)),
+                ('operator', models.CharField(choices=[('ABOVE', 'Above'), ('BELOW', 'Below')], default='ABOVE', max_length=10)),
+                ('threshold', models.FloatField()),
+                ('hysteresis', models.FloatField(default=0.0)),
+                ('duration', models.IntegerField(default=0)),
+                ('action', models.CharField(choices=[('ALERT', 'Alert'), ('FAN_BOOST', 'Boost AC Fan')], default='ALERT', max_length=20)),
+                ('enabled', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hotel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='automation_rules', to='hotel.hotel')),
+            ],
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.apps import apps
 from django.db import models
 from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.utils import timezone
+from .metrics import metrics
 
 # Ensure app is properly configured
 if not apps.is_installed('hotel'):
@@ -62,6 +63,64 @@ class Room(models.Model):
 
 # models.py
 
+class ControlChangeTrackingMixin:
+    """
+    Remembers the values a control was loaded with so save() can skip
+    writes that change nothing and update only the changed columns.
+    Validation runs on the changed fields only; pass validate=False when
+    the values were already validated once for a whole batch.
+    """
+    untracked_fields = ('id', 'created_at', 'updated_at')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        """Names of the fields that differ from the loaded values, None if unknown"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        changed = []
+        for field in self._meta.concrete_fields:
+            if field.name in self.untracked_fields:
+                continue
+            if field.attname in loaded:
+                if getattr(self, field.attname) != loaded[field.attname]:
+                    changed.append(field.name)
+            elif field.attname in self.__dict__:
+                # Deferred when loaded but assigned since, so it can't be compared
+                changed.append(field.name)
+        return changed
+
+    def save(self, *args, validate=True, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            changed = self.changed_fields()
+            if changed is not None:
+                if not changed:
+                    metrics.increment('controls.skipped_writes')
+                    return
+                kwargs['update_fields'] = changed + ['updated_at']
+
+        if validate:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                self.full_clean()
+            else:
+                self.full_clean(
+                    exclude=[field.name for field in self._meta.fields if field.name not in update_fields],
+                    validate_unique='device' in update_fields
+                )
+        super().save(*args, **kwargs)
+        metrics.increment('controls.writes')
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
 class RoomDevice(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='devices')
     device_type = models.CharField(max_length=50)
@@ -78,7 +137,7 @@ class RoomDevice(models.Model):
     def __str__(self):
         return f"{self.device_type} - Room {self.room.number}"
 
-class ACControl(models.Model):
+class ACControl(ControlChangeTrackingMixin, models.Model):
     device = models.OneToOneField(RoomDevice, on_delete=models.CASCADE, related_name='ac_control')
     temperature = models.FloatField(default=24.0)
     mode = models.CharField(
@@ -111,14 +170,10 @@ class ACControl(models.Model):
         if errors:
             raise ValidationError(errors)
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"AC Control - Room {self.device.room.number}"
 
-class LightingControl(models.Model):
+class LightingControl(ControlChangeTrackingMixin, models.Model):
     device = models.OneToOneField(RoomDevice, on_delete=models.CASCADE, related_name='lighting_control')
     brightness = models.IntegerField(default=100)  # 0-100
     color_temperature = models.IntegerField(default=2700)  # Kelvin
@@ -142,10 +197,6 @@ class LightingControl(models.Model):
         if errors:
             raise ValidationError(errors)
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"Lighting Control - Room {self.device.room.number}"
 
@@ -212,3 +263,84 @@ class LifeBeingSensorData(models.Model):
 
     def __str__(self):
         return f"Life Being Data - Room {self.room.number} - {self.timestamp}"
+
+class FloorStatistics(models.Model):
+    """Precomputed counters for a floor, kept up to date by hotel.statistics"""
+    floor = models.OneToOneField(Floor, on_delete=models.CASCADE, related_name='statistics')
+    total_rooms = models.IntegerField(default=0)
+    occupied_rooms = models.IntegerField(default=0)
+    online_sensors = models.IntegerField(default=0)
+    temperature_sum = models.FloatField(default=0.0)
+    temperature_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_temperature(self):
+        """Running average of all IAQ temperature readings on the floor"""
+        if not self.temperature_count:
+            return None
+        return self.temperature_sum / self.temperature_count
+
+    def __str__(self):
+        return f"Statistics - Floor {self.floor.number}"
+
+class HotelStatistics(models.Model):
+    """Precomputed counters for a hotel, kept up to date by hotel.statistics"""
+    hotel = models.OneToOneField(Hotel, on_delete=models.CASCADE, related_name='statistics')
+    total_floors = models.IntegerField(default=0)
+    total_rooms = models.IntegerField(default=0)
+    occupied_rooms = models.IntegerField(default=0)
+    online_sensors = models.IntegerField(default=0)
+    power_usage_sum = models.FloatField(default=0.0)
+    power_usage_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_energy_consumption(self):
+        """Running average of all energy readings in the hotel"""
+        if not self.power_usage_count:
+            return None
+        return self.power_usage_sum / self.power_usage_count
+
+    def __str__(self):
+        return f"Statistics - {self.hotel.name}"
+
+class RuleOperator(models.TextChoices):
+    ABOVE = 'ABOVE', 'Above'
+    BELOW = 'BELOW', 'Below'
+
+class RuleAction(models.TextChoices):
+    ALERT = 'ALERT', 'Alert'
+    FAN_BOOST = 'FAN_BOOST', 'Boost AC Fan'
+
+class AutomationRule(models.Model):
+    """Threshold rule on an IAQ metric, compiled and evaluated by hotel.rules"""
+    METRICS = ['temperature', 'humidity', 'co2', 'tvoc', 'pm25', 'noise', 'illuminance']
+
+    name = models.CharField(max_length=255)
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='automation_rules', null=True, blank=True)
+    metric = models.CharField(max_length=20, choices=[(metric, metric) for metric in METRICS])
+    operator = models.CharField(max_length=10, choices=RuleOperator.choices, default=RuleOperator.ABOVE)
+    threshold = models.FloatField()
+    hysteresis = models.FloatField(default=0.0)
+    duration = models.IntegerField(default=0)  # seconds the condition must hold
+    action = models.CharField(max_length=20, choices=RuleAction.choices, default=RuleAction.ALERT)
+    enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def clean(self):
+        """Validate the model"""
+        errors = {}
+
+        if self.hysteresis is not None and self.hysteresis < 0:
+            errors['hysteresis'] = 'Hysteresis cannot be negative'
+
+        if self.duration is not None and self.duration < 0:
+            errors['duration'] = 'Duration cannot be negative'
+
+        if errors:
+            raise ValidationError(errors)
+
+    def __str__(self):
+        return f"{self.name} ({self.metric} {self.get_operator_display().lower()} {self.threshold})"
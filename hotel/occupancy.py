@@ -0,0 +1,268 @@
+# occupancy.py
+import json
+import logging
+import threading
+import time
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Room, DeviceAutomation
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'hotel:occupancy'
+
+VACANT = 'VACANT'
+OCCUPIED = 'OCCUPIED'
+GRACE = 'GRACE'
+
+class TimerWheel:
+    """
+    Hashed timer wheel. Timers are hashed into one of `slots` buckets by
+    their expiry tick, so scheduling, cancelling and advancing one tick are
+    all O(1) regardless of how many rooms have a pending timeout.
+    """
+
+    def __init__(self, tick=1.0, slots=512, clock=time.monotonic):
+        self.tick = tick
+        self.slots = [dict() for _ in range(slots)]
+        self.clock = clock
+        self.current = int(clock() / tick)
+        self.timers = {}
+        self.lock = threading.Lock()
+
+    def schedule(self, key, delay, value=None):
+        """(Re)schedule a timer for key to fire after delay seconds"""
+        with self.lock:
+            self._cancel(key)
+            expiry = max(int((self.clock() + delay) / self.tick), self.current + 1)
+            slot = expiry % len(self.slots)
+            self.slots[slot][key] = (expiry, value)
+            self.timers[key] = slot
+
+    def cancel(self, key):
+        with self.lock:
+            self._cancel(key)
+
+    def _cancel(self, key):
+        slot = self.timers.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def __len__(self):
+        return len(self.timers)
+
+    def advance(self):
+        """Move the wheel up to the current time, returns expired (key, value) pairs"""
+        expired = []
+        with self.lock:
+            target = int(self.clock() / self.tick)
+            # A wheel that fell more than a revolution behind only needs one pass
+            start = max(self.current + 1, target - len(self.slots) + 1)
+            for tick in range(start, target + 1):
+                bucket = self.slots[tick % len(self.slots)]
+                due = [key for key, (expiry, _) in bucket.items() if expiry <= target]
+                for key in due:
+                    expired.append((key, bucket.pop(key)[1]))
+                    del self.timers[key]
+            self.current = max(self.current, target)
+        return expired
+
+class RoomOccupancy:
+    __slots__ = ('state', 'timeout', 'last_presence')
+
+    def __init__(self, state, timeout, last_presence):
+        self.state = state
+        self.timeout = timeout
+        self.last_presence = last_presence
+
+class OccupancyTracker:
+    """
+    Per room occupancy state machine: OCCUPIED -> GRACE -> VACANT.
+
+    A presence sample keeps (or makes) a room occupied. An absent sample
+    starts the grace period, and the room only becomes vacant once
+    presence_timeout minutes pass without presence. Room.is_occupied and
+    DeviceAutomation.last_presence_time are written on real transitions only.
+
+    The state machine runs in one process, the ingest process that calls
+    start(), so there is a single copy of each room's state and timer.
+    Other processes forward the presence readings and settings changes
+    they store to it over Redis pub/sub.
+    """
+
+    def __init__(self, tick=1.0, slots=512):
+        self.rooms = {}
+        self.wheel = TimerWheel(tick=tick, slots=slots)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopped = threading.Event()
+        self.running = False
+        self.connection = None
+        self.shared = None
+
+    def load(self, room_id):
+        is_occupied, timeout, last_presence = Room.objects.filter(pk=room_id).values_list(
+            'is_occupied', 'automation__presence_timeout', 'automation__last_presence_time'
+        ).get()
+        if timeout is None:
+            timeout = DeviceAutomation._meta.get_field('presence_timeout').default
+        if is_occupied:
+            # last_presence_time is the arrival, not the latest presence: count the grace period from now
+            last_presence = timezone.now()
+        return RoomOccupancy(OCCUPIED if is_occupied else VACANT, timeout * 60, last_presence)
+
+    def record(self, room_id):
+        with self.lock:
+            record = self.rooms.get(room_id)
+        if record is None:
+            # Loaded outside the lock so a slow query doesn't hold up other rooms
+            loaded = self.load(room_id)
+            with self.lock:
+                record = self.rooms.setdefault(room_id, loaded)
+        return record
+
+    def settings_changed(self, room_id):
+        """Pick up a new presence_timeout the next time the room is seen"""
+        message = {'room': room_id, 'settings': True}
+        transaction.on_commit(lambda: self.submit(message))
+
+    def reading_saved(self, reading):
+        """Observe a stored presence reading once committed, whether it came over MQTT or HTTP"""
+        message = {
+            'room': reading.room_id,
+            'present': bool(reading.presence_detected),
+            'timestamp': reading.timestamp.isoformat() if reading.timestamp else None,
+        }
+        transaction.on_commit(lambda: self.submit(message))
+
+    def submit(self, message):
+        """Apply a message here if this process runs the tracker, otherwise forward it to the one that does"""
+        if not self.running:
+            self.connect()
+            if self.shared:
+                try:
+                    self.connection.publish(CHANNEL, json.dumps(message))
+                except Exception as e:
+                    logger.error(f"Failed to forward occupancy update for room {message['room']}: {e}")
+                return
+            # Without Redis (e.g. the locmem test cache) this is the only process, track here
+            self.start()
+        self.apply(message)
+
+    def apply(self, message):
+        try:
+            if message.get('settings'):
+                with self.lock:
+                    record = self.rooms.get(message['room'])
+                    if record is not None and record.state != GRACE:
+                        del self.rooms[message['room']]
+                return
+            timestamp = parse_datetime(message['timestamp']) if message.get('timestamp') else None
+            self.observe(message['room'], message['present'], timestamp)
+        except Exception as e:
+            logger.error(f"Error updating room occupancy: {e}")
+
+    def observe(self, room_id, present, timestamp=None):
+        """Feed one presence sample into the state machine"""
+        timestamp = timestamp or timezone.now()
+        record = self.record(room_id)
+        with self.lock:
+            # Put it back if a settings change dropped it while it was loading
+            record = self.rooms.setdefault(room_id, record)
+
+            if present:
+                previous = record.state
+                record.state = OCCUPIED
+                record.last_presence = timestamp
+                if previous == GRACE:
+                    self.wheel.cancel(room_id)
+                if previous != VACANT:
+                    return
+            elif record.state == OCCUPIED:
+                record.state = GRACE
+                elapsed = (timestamp - record.last_presence).total_seconds() if record.last_presence else 0
+                self.wheel.schedule(room_id, max(record.timeout - elapsed, 0))
+                return
+            else:
+                return
+
+        self.write(room_id, True, timestamp)
+
+    def expire(self):
+        """Mark rooms whose grace period ran out as vacant"""
+        for room_id, _ in self.wheel.advance():
+            with self.lock:
+                record = self.rooms.get(room_id)
+                if record is None or record.state != GRACE:
+                    continue
+                record.state = VACANT
+                last_presence = record.last_presence
+            self.write(room_id, False, last_presence)
+
+    def write(self, room_id, occupied, last_presence):
+        try:
+            room = Room.objects.only('id', 'floor_id', 'is_occupied').get(pk=room_id)
+            if room.is_occupied != occupied:
+                room.is_occupied = occupied
+                # save() rather than update() so occupancy counters and triggers see it
+                room.save(update_fields=['is_occupied'])
+            if last_presence is not None:
+                DeviceAutomation.objects.filter(room_id=room_id).update(last_presence_time=last_presence)
+            logger.info(f"Room {room_id} is now {'occupied' if occupied else 'vacant'}")
+        except Exception as e:
+            logger.error(f"Error updating room occupancy: {e}")
+
+    def connect(self):
+        if self.shared is not None:
+            return
+        try:
+            from django_redis import get_redis_connection
+            self.connection = get_redis_connection('default')
+            self.shared = True
+        except (ImportError, NotImplementedError):
+            self.shared = False
+
+    def start(self):
+        """Run the tracker in this process: drive the timer wheel and take updates forwarded by others"""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self.run, name='occupancy-wheel', daemon=True)
+        self.thread.start()
+        self.connect()
+        if self.shared:
+            threading.Thread(target=self.listen, name='occupancy-updates', daemon=True).start()
+
+    def listen(self):
+        while not self.stopped.is_set():
+            try:
+                pubsub = self.connection.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                logger.info("Occupancy tracker subscribed to forwarded updates")
+                for message in pubsub.listen():
+                    close_old_connections()
+                    try:
+                        self.apply(json.loads(message['data']))
+                    except (TypeError, ValueError):
+                        logger.warning(f"Invalid occupancy message: {message['data']!r}")
+            except Exception as e:
+                logger.error(f"Occupancy subscription lost: {e}")
+            time.sleep(1)
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.wait(self.wheel.tick):
+            close_old_connections()
+            try:
+                self.expire()
+            except Exception as e:
+                logger.error(f"Occupancy timer error: {e}")
+
+tracker = OccupancyTracker()
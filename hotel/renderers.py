@@ -0,0 +1,50 @@
+# renderers.py
+from django.conf import settings
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# DRF's encoder already knows how to turn Decimals, querysets, lazy strings
+# and timedeltas into JSON types, orjson calls it for anything it can't handle
+_drf_encoder = encoders.JSONEncoder()
+
+ORJSON_OPTIONS = (
+    orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if orjson else 0
+)
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer backed by orjson. Falls back to DRF's renderer when
+    orjson isn't installed or the client asked for indented output.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_drf_encoder.default, option=ORJSON_OPTIONS)
+
+class FastJSONParser(parsers.JSONParser):
+    """JSON parser backed by orjson"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read() if stream is not None else b''
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
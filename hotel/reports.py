@@ -0,0 +1,39 @@
+# reports.py
+from datetime import timedelta
+from django.db.models import Avg, Sum
+from django.utils import timezone
+from .models import EnergyConsumption
+from .device_state import registry, control_data
+from .serializers import IAQSensorDataSerializer, LifeBeingSensorDataSerializer
+
+def get_room_status_data(room):
+    """Current environment, presence and device state of a room"""
+    latest_iaq = room.iaq_data.order_by('-timestamp').first()
+    latest_life = room.life_being_data.order_by('-timestamp').first()
+    devices = registry.get(room.id)
+
+    return {
+        'room_number': room.number,
+        'occupied': room.is_occupied,
+        'last_cleaned': room.last_cleaned,
+        'environmental_data': IAQSensorDataSerializer(latest_iaq).data if latest_iaq else None,
+        'presence_data': LifeBeingSensorDataSerializer(latest_life).data if latest_life else None,
+        'ac_status': control_data(devices.ac) if devices else None,
+        'lighting_status': control_data(devices.lighting) if devices else None,
+    }
+
+def get_energy_report_data(room, days=1):
+    """Energy consumption of a room over the last few days"""
+    start_date = timezone.now() - timedelta(days=days)
+    consumption = EnergyConsumption.objects.filter(
+        room=room,
+        timestamp__gte=start_date
+    )
+
+    return {
+        'total_consumption': consumption.aggregate(Sum('power_usage'))['power_usage__sum'],
+        'average_daily_consumption': list(consumption.values('device__device_type').annotate(
+            avg_usage=Avg('power_usage'),
+            total_usage=Sum('power_usage')
+        ).order_by('device__device_type'))
+    }
@@ -0,0 +1,293 @@
+# rules.py
+import logging
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .metrics import metrics
+from .models import AutomationRule, ACControl, Room, RuleOperator, RuleAction
+from .device_control import ac_command_topic, publish_device_commands
+from .device_state import registry
+
+logger = logging.getLogger(__name__)
+
+RULES_VERSION_KEY = 'automation:rules:version'
+BOOST_FAN_SPEED = 5
+
+class CompiledRule:
+    __slots__ = ('id', 'name', 'hotel_id', 'metric', 'sign', 'threshold', 'exit', 'duration', 'action')
+
+    def __init__(self, rule):
+        # BELOW rules are evaluated as ABOVE rules on the negated value,
+        # so both directions share the same sorted threshold logic
+        self.sign = -1 if rule.operator == RuleOperator.BELOW else 1
+        self.id = rule.id
+        self.name = rule.name
+        self.hotel_id = rule.hotel_id
+        self.metric = rule.metric
+        self.threshold = self.sign * rule.threshold
+        self.exit = self.threshold - rule.hysteresis
+        self.duration = rule.duration
+        self.action = rule.action
+
+class MetricPlan:
+    """
+    Rules for one metric and direction, sorted by entry and exit threshold.
+    A reading only has to look at the rules whose thresholds lie between
+    the previous and the current value, found by bisection.
+    """
+
+    def __init__(self, rules):
+        self.rules = {rule.id: rule for rule in rules}
+        self.enter = sorted((rule.threshold, rule.id) for rule in rules)
+        self.exit = sorted((rule.exit, rule.id) for rule in rules)
+        self.enter_keys = [threshold for threshold, _ in self.enter]
+        self.exit_keys = [threshold for threshold, _ in self.exit]
+
+    def entered(self, low, high):
+        """Rules with low <= threshold < high"""
+        return [self.enter[i][1] for i in range(bisect_left(self.enter_keys, low), bisect_left(self.enter_keys, high))]
+
+    def exited(self, low, high):
+        """Rules with low <= exit threshold < high"""
+        return [self.exit[i][1] for i in range(bisect_left(self.exit_keys, low), bisect_left(self.exit_keys, high))]
+
+    def satisfied(self, value, active):
+        """Full evaluation, used when a room has no previous value for the plan"""
+        result = {rule_id for threshold, rule_id in self.enter if threshold < value}
+        result.update(rule_id for rule_id in active if rule_id in self.rules and value > self.rules[rule_id].exit)
+        return result
+
+class RoomRuleState:
+    __slots__ = ('value', 'active', 'pending')
+
+    def __init__(self):
+        self.value = None
+        self.active = set()
+        self.pending = {}
+
+class FanBoost:
+    """The fan speed a room had before its first boost, and the rules holding the boost"""
+    __slots__ = ('restore', 'rules')
+
+    def __init__(self, restore):
+        self.restore = restore
+        self.rules = set()
+
+class RuleEngine:
+    """
+    Evaluates AutomationRules against ingested IAQ readings. Rules are
+    compiled into one plan per (metric, direction); per room state keeps the
+    last value, the active rules and when they became active, so hysteresis
+    and minimum durations need no queries.
+    """
+
+    def __init__(self, refresh_interval=5.0):
+        self.refresh_interval = refresh_interval
+        self.plans = {}
+        self.rules = {}
+        self.states = {}
+        self.boosts = {}
+        self.rooms = {}
+        self.version = None
+        self.loaded_at = None
+        self.checked_at = 0.0
+        self.lock = threading.RLock()
+
+    # Compilation
+
+    def refresh(self, force=False):
+        """Recompile the plans for rules changed since the last load"""
+        now = time.monotonic()
+        if not force and now - self.checked_at < self.refresh_interval:
+            return
+        self.checked_at = now
+        version = cache.get(RULES_VERSION_KEY)
+        if not force and self.loaded_at is not None and version == self.version:
+            return
+
+        started = timezone.now()
+        with self.lock:
+            if self.loaded_at is None:
+                changed = list(AutomationRule.objects.all())
+            else:
+                # A small overlap covers clock skew between replicas, recompiling is idempotent
+                changed = list(AutomationRule.objects.filter(updated_at__gte=self.loaded_at - timedelta(seconds=1)))
+            current_ids = set(AutomationRule.objects.values_list('id', flat=True))
+
+            touched = set()
+            # Rules deleted, disabled or moved to another plan stop being active where they were
+            retired = {}
+            for rule_id in [rule_id for rule_id in self.rules if rule_id not in current_ids]:
+                key = self.plan_key(self.rules.pop(rule_id))
+                touched.add(key)
+                retired[rule_id] = key
+            for rule in changed:
+                previous = self.rules.pop(rule.id, None)
+                if previous is not None:
+                    touched.add(self.plan_key(previous))
+                if rule.enabled:
+                    compiled = self.rules[rule.id] = CompiledRule(rule)
+                    touched.add(self.plan_key(compiled))
+                if previous is not None and (not rule.enabled or self.plan_key(compiled) != self.plan_key(previous)):
+                    retired[rule.id] = self.plan_key(previous)
+
+            for key in touched:
+                rules = [rule for rule in self.rules.values() if self.plan_key(rule) == key]
+                if rules:
+                    self.plans[key] = MetricPlan(rules)
+                else:
+                    self.plans.pop(key, None)
+                # Rooms fall back to a full evaluation of the recompiled plan on their next reading
+                for (room_id, plan_key), state in self.states.items():
+                    if plan_key == key:
+                        state.value = None
+            self.retire(retired)
+
+            self.version = version
+            self.loaded_at = started
+        if touched:
+            logger.info(f"Recompiled {len(touched)} rule plans, {len(self.rules)} rules active")
+
+    @staticmethod
+    def plan_key(rule):
+        return (rule.metric, rule.sign)
+
+    def retire(self, retired):
+        """Deactivate rules that left their plan, undoing the fan boosts they still hold"""
+        if not retired:
+            return
+        for (room_id, key), state in list(self.states.items()):
+            for rule_id in [rule_id for rule_id in state.active if retired.get(rule_id) == key]:
+                state.active.discard(rule_id)
+                if state.pending.pop(rule_id, None) is None:
+                    self.release(room_id, rule_id)
+            if key not in self.plans and not state.active:
+                del self.states[(room_id, key)]
+
+    # Evaluation
+
+    def room(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = Room.objects.filter(pk=room_id).values_list(
+                'number', 'floor__hotel_id'
+            ).get()
+        return room
+
+    def evaluate(self, readings):
+        """Run every compiled rule against a batch of IAQ readings"""
+        self.refresh()
+        if not self.plans:
+            return
+        with self.lock:
+            for reading in readings:
+                timestamp = reading.timestamp or timezone.now()
+                for (metric, sign), plan in self.plans.items():
+                    value = getattr(reading, metric, None)
+                    if value is None:
+                        continue
+                    self.evaluate_plan(reading.room_id, (metric, sign), plan, sign * value, value, timestamp)
+
+    def evaluate_plan(self, room_id, key, plan, value, raw_value, timestamp):
+        state = self.states.get((room_id, key))
+        if state is None:
+            state = self.states[(room_id, key)] = RoomRuleState()
+
+        if state.value is None:
+            satisfied = plan.satisfied(value, state.active)
+            entered = [rule_id for rule_id in satisfied if rule_id not in state.active]
+            exited = [rule_id for rule_id in state.active if rule_id not in satisfied]
+        elif value > state.value:
+            entered = [rule_id for rule_id in plan.entered(state.value, value) if rule_id not in state.active]
+            exited = []
+        elif value < state.value:
+            entered = []
+            exited = [rule_id for rule_id in plan.exited(value, state.value) if rule_id in state.active]
+        else:
+            entered = exited = []
+        state.value = value
+
+        hotel_id = None
+        for rule_id in entered:
+            rule = plan.rules[rule_id]
+            if rule.hotel_id is not None:
+                hotel_id = hotel_id or self.room(room_id)[1]
+                if rule.hotel_id != hotel_id:
+                    continue
+            state.active.add(rule_id)
+            state.pending[rule_id] = timestamp
+        for rule_id in exited:
+            state.active.discard(rule_id)
+            if state.pending.pop(rule_id, None) is None:
+                self.clear(room_id, rule_id, raw_value)
+
+        # Only rules still waiting out their duration are looked at on every reading
+        for rule_id, since in list(state.pending.items()):
+            rule = plan.rules.get(rule_id)
+            if rule is None:
+                del state.pending[rule_id]
+            elif (timestamp - since).total_seconds() >= rule.duration:
+                del state.pending[rule_id]
+                self.fire(room_id, rule, raw_value)
+
+    # Actions
+
+    def fire(self, room_id, rule, value):
+        metrics.increment('rules.fired')
+        room_number = self.room(room_id)[0]
+        if rule.action == RuleAction.ALERT:
+            metrics.increment('rules.alerts')
+            logger.warning(f"Rule '{rule.name}' triggered in room {room_number}: {rule.metric}={value}")
+        elif rule.action == RuleAction.FAN_BOOST:
+            self.boost(room_id, room_number, rule.id)
+            logger.info(f"Rule '{rule.name}' boosted the AC fan in room {room_number}: {rule.metric}={value}")
+
+    def clear(self, room_id, rule_id, value):
+        metrics.increment('rules.cleared')
+        self.release(room_id, rule_id)
+        rule = self.rules.get(rule_id)
+        if rule is not None:
+            logger.info(f"Rule '{rule.name}' cleared in room {self.room(room_id)[0]}: {rule.metric}={value}")
+
+    def boost(self, room_id, room_number, rule_id):
+        """Boost the fan; only the first boost of a room remembers the speed to go back to"""
+        boost = self.boosts.get(room_id)
+        if boost is None:
+            state = registry.get(room_id)
+            # The room may have been deleted since the reading was stored
+            if state is None or state.ac is None or state.ac.fan_speed is None:
+                return
+            boost = self.boosts[room_id] = FanBoost(state.ac.fan_speed)
+            self.set_fan_speed(room_id, room_number, BOOST_FAN_SPEED)
+        boost.rules.add(rule_id)
+
+    def release(self, room_id, rule_id):
+        """Drop a rule's boost, restoring the fan once no rule holds one any more"""
+        boost = self.boosts.get(room_id)
+        if boost is None or rule_id not in boost.rules:
+            return
+        boost.rules.discard(rule_id)
+        if not boost.rules:
+            del self.boosts[room_id]
+            self.set_fan_speed(room_id, self.room(room_id)[0], boost.restore)
+
+    def set_fan_speed(self, room_id, room_number, fan_speed):
+        now = timezone.now()
+        ACControl.objects.filter(device__room_id=room_id, device__device_type='AC').update(
+            fan_speed=fan_speed, updated_at=now
+        )
+        registry.update(room_id, 'AC', fan_speed=fan_speed, updated_at=now)
+        publish_device_commands([(ac_command_topic(room_number), {'fan_speed': fan_speed})])
+
+def rules_enabled():
+    return getattr(settings, 'AUTOMATION_RULES_ENABLED', True)
+
+def rules_changed():
+    """Tell every process to recompile its rule plans"""
+    cache.set(RULES_VERSION_KEY, time.time(), None)
+
+engine = RuleEngine()
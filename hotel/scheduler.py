@@ -0,0 +1,123 @@
+# scheduler.py
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from .automation import BatchAutomationEngine
+from . import thermal
+from .metrics import metrics, publish
+from .models import Floor, Room
+
+logger = logging.getLogger(__name__)
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class ShardedAutomationScheduler:
+    """
+    Runs the batch automation engine for every room once per interval
+    across any number of replicas. Rooms are sharded by floor and every
+    cycle each replica claims shards through a cache lease (an atomic add
+    on a per cycle key), so each shard is evaluated by exactly one replica
+    and more replicas means shorter cycles.
+    """
+
+    def __init__(self, interval=30, worker_id=None, engine=None, thermal_refresh=300):
+        self.interval = interval
+        self.thermal_refresh = thermal_refresh
+        self.worker_id = worker_id or default_worker_id()
+        self.engine = engine or BatchAutomationEngine()
+        self.stopped = threading.Event()
+
+    def lease_key(self, cycle, shard):
+        return f"automation:lease:{cycle}:{shard}"
+
+    def claim(self, cycle, shard):
+        # The lease expires with the cycle, so a crashed replica never blocks a shard
+        return cache.add(self.lease_key(cycle, shard), self.worker_id, timeout=self.interval)
+
+    def shards(self):
+        """Floor IDs, rotated per worker so replicas start on different shards"""
+        floors = list(Floor.objects.order_by('id').values_list('id', flat=True))
+        if not floors:
+            return floors
+        offset = zlib.crc32(self.worker_id.encode()) % len(floors)
+        return floors[offset:] + floors[:offset]
+
+    def thermal_due(self, cycle):
+        """Whether this cycle is the first one in a new thermal refresh period"""
+        if not self.thermal_refresh:
+            return False
+        return (cycle * self.interval) // self.thermal_refresh != ((cycle - 1) * self.interval) // self.thermal_refresh
+
+    def run_cycle(self, cycle):
+        cycle_start = cycle * self.interval
+        started = time.time()
+        lag = started - cycle_start
+        shards = rooms = 0
+        refresh_thermal = self.thermal_due(cycle)
+
+        for floor_id in self.shards():
+            if self.stopped.is_set():
+                break
+            if not self.claim(cycle, floor_id):
+                continue
+            try:
+                floor_rooms = Room.objects.filter(floor_id=floor_id)
+                if refresh_thermal:
+                    thermal.fit(floor_rooms.values_list('id', flat=True))
+                result = self.engine.run(floor_rooms)
+                shards += 1
+                rooms += result['rooms']
+            except Exception as e:
+                logger.error(f"Automation failed for floor {floor_id}: {e}")
+                metrics.increment('automation.scheduler.shard_errors')
+
+        duration = time.time() - started
+        metrics.observe('automation.scheduler.cycle_seconds', duration)
+        metrics.observe('automation.scheduler.lag_seconds', lag)
+        metrics.increment('automation.scheduler.shards', shards)
+        metrics.increment('automation.scheduler.rooms', rooms)
+        # The scheduler runs in its own container, so its metrics are shared through the cache
+        try:
+            publish(f"automation_scheduler:{self.worker_id}", ttl=self.interval * 3)
+        except Exception as e:
+            logger.warning(f"Could not publish scheduler metrics: {e}")
+        summary = {
+            'cycle': cycle,
+            'worker': self.worker_id,
+            'shards': shards,
+            'rooms': rooms,
+            'duration': round(duration, 3),
+            'lag': round(lag, 3)
+        }
+        if duration > self.interval:
+            logger.warning(f"Automation cycle overran its interval: {summary}")
+        else:
+            logger.info(f"Automation cycle: {summary}")
+        return summary
+
+    def run(self):
+        """Run a cycle at every interval boundary until stopped"""
+        logger.info(f"Automation scheduler {self.worker_id} started, interval {self.interval}s")
+        last_cycle = None
+        while not self.stopped.is_set():
+            cycle = int(time.time() // self.interval)
+            if cycle != last_cycle:
+                close_old_connections()
+                self.run_cycle(cycle)
+                last_cycle = cycle
+            self.stopped.wait((cycle + 1) * self.interval - time.time())
+
+    def stop(self):
+        self.stopped.set()
+
+def scheduler_from_settings(**kwargs):
+    kwargs.setdefault('interval', getattr(settings, 'AUTOMATION_INTERVAL_SECONDS', 30))
+    kwargs.setdefault('thermal_refresh', getattr(settings, 'THERMAL_MODEL_REFRESH_SECONDS', 300))
+    return ShardedAutomationScheduler(**kwargs)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import (
     Hotel,
     Floor,
@@ -7,18 +8,57 @@ from .models import (
     ACControl,
     LightingControl,
     DeviceAutomation,
+    AutomationRule,
     EnergyConsumption,
     IAQSensorData,
     LifeBeingSensorData
 )
 
-class HotelSerializer(serializers.ModelSerializer):
+def parse_field_list(value):
+    """Split a comma separated query parameter into a set of names"""
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+def requested_fieldsets(request):
+    """Return the (fields, expand) sets asked for by a read request, None when absent"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = request.query_params
+    fields = parse_field_list(params['fields']) if 'fields' in params else None
+    expand = parse_field_list(params['expand']) if 'expand' in params else None
+    return fields, expand
+
+class SparseFieldsetMixin:
+    """
+    Honour ?fields= (top level fields to return) and ?expand= (nested
+    fields to build, at any depth). Without ?expand= every field listed in
+    Meta.expandable is built, so existing clients see the same payload.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = requested_fieldsets(self.context.get('request'))
+
+        if requested is not None and self._is_top_level():
+            fields = {name: field for name, field in fields.items() if name in requested}
+        if expand is not None:
+            for name in getattr(self.Meta, 'expandable', ()):
+                if name not in expand:
+                    fields.pop(name, None)
+        return fields
+
+    def _is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+class HotelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Hotel
         fields = ['id', 'name', 'address', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
-class FloorSerializer(serializers.ModelSerializer):
+class FloorSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Floor
         fields = ['id', 'hotel', 'number', 'description', 'created_at', 'updated_at']
@@ -32,7 +72,7 @@ class FloorSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Floor number must be positive")
         return value
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Room
         fields = [
@@ -149,6 +189,26 @@ class DeviceAutomationSerializer(serializers.ModelSerializer):
             )
         return value
 
+class AutomationRuleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AutomationRule
+        fields = [
+            'id', 'name', 'hotel', 'metric', 'operator', 'threshold',
+            'hysteresis', 'duration', 'action', 'enabled',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['created_at', 'updated_at']
+
+    def validate_hysteresis(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Hysteresis cannot be negative")
+        return value
+
+    def validate_duration(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Duration cannot be negative")
+        return value
+
 class EnergyConsumptionSerializer(serializers.ModelSerializer):
     energy_consumed = serializers.FloatField(read_only=True)
 
@@ -210,10 +270,11 @@ class DetailedRoomSerializer(RoomSerializer):
     life_being_data = serializers.SerializerMethodField()
 
     class Meta(RoomSerializer.Meta):
-        fields = RoomSerializer.Meta.fields + [
+        expandable = [
             'devices', 'automation', 'energy_consumption',
             'iaq_data', 'life_being_data'
         ]
+        fields = RoomSerializer.Meta.fields + expandable
 
     def get_energy_consumption(self, obj):
         """Get the latest energy consumption data"""
@@ -240,10 +301,12 @@ class DetailedFloorSerializer(FloorSerializer):
     rooms = DetailedRoomSerializer(many=True, read_only=True)
 
     class Meta(FloorSerializer.Meta):
-        fields = FloorSerializer.Meta.fields + ['rooms']
+        expandable = ['rooms']
+        fields = FloorSerializer.Meta.fields + expandable
 
 class DetailedHotelSerializer(HotelSerializer):
     floors = DetailedFloorSerializer(many=True, read_only=True)
 
     class Meta(HotelSerializer.Meta):
-        fields = HotelSerializer.Meta.fields + ['floors']
\ No newline at end of file
+        expandable = ['floors']
+        fields = HotelSerializer.Meta.fields + expandable
\ No newline at end of file
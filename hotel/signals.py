@@ -0,0 +1,144 @@
+# signals.py
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from . import statistics, triggers, occupancy, rules, device_state
+from .chat import response_cache
+from .models import (
+    Hotel,
+    Floor,
+    Room,
+    RoomDevice,
+    ACControl,
+    LightingControl,
+    FloorStatistics,
+    HotelStatistics,
+    DeviceAutomation,
+    AutomationRule,
+    EnergyConsumption,
+    IAQSensorData,
+    LifeBeingSensorData
+)
+
+@receiver(post_save, sender=Hotel)
+def create_hotel_statistics(sender, instance, created, **kwargs):
+    if created:
+        HotelStatistics.objects.create(hotel=instance)
+
+@receiver(post_save, sender=Floor)
+def create_floor_statistics(sender, instance, created, **kwargs):
+    if created:
+        FloorStatistics.objects.create(floor=instance)
+        statistics.increment_hotel(instance.hotel_id, total_floors=1)
+
+@receiver(post_delete, sender=Floor)
+def floor_deleted(sender, instance, **kwargs):
+    statistics.increment_hotel(instance.hotel_id, total_floors=-1)
+
+@receiver(post_init, sender=Room)
+def remember_room_state(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not fetched
+    instance._statistics_state = (
+        instance.__dict__.get('floor_id'),
+        instance.__dict__.get('is_occupied')
+    )
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, created, **kwargs):
+    old_floor_id, was_occupied = instance._statistics_state
+    occupied = int(bool(instance.is_occupied))
+
+    if created:
+        statistics.increment_floor(instance.floor_id, total_rooms=1, occupied_rooms=occupied)
+    elif old_floor_id is not None and old_floor_id != instance.floor_id:
+        statistics.increment_floor(old_floor_id, total_rooms=-1, occupied_rooms=-int(bool(was_occupied)))
+        statistics.increment_floor(instance.floor_id, total_rooms=1, occupied_rooms=occupied)
+    elif was_occupied is not None and bool(was_occupied) != bool(instance.is_occupied):
+        statistics.increment_floor(instance.floor_id, occupied_rooms=occupied - int(bool(was_occupied)))
+        triggers.occupancy_changed(instance)
+
+    instance._statistics_state = (instance.floor_id, instance.is_occupied)
+    if not created:
+        response_cache.room_changed(instance.id)
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    statistics.increment_floor(
+        instance.floor_id,
+        total_rooms=-1,
+        occupied_rooms=-int(bool(instance.is_occupied))
+    )
+    device_state.registry.forget(instance.id)
+
+@receiver(post_save, sender=RoomDevice)
+def device_saved(sender, instance, created, **kwargs):
+    if instance.device_type not in device_state.STATE_CLASSES:
+        return
+    if created:
+        device_state.registry.forget(instance.room_id)
+    else:
+        device_state.registry.update(instance.room_id, instance.device_type, instance.id, status=instance.status)
+
+@receiver(post_delete, sender=RoomDevice)
+def device_deleted(sender, instance, **kwargs):
+    device_state.registry.forget(instance.room_id)
+
+@receiver(post_save, sender=ACControl)
+def ac_control_saved(sender, instance, created, **kwargs):
+    device_state.record_control(instance, 'AC', created)
+
+@receiver(post_save, sender=LightingControl)
+def lighting_control_saved(sender, instance, created, **kwargs):
+    device_state.record_control(instance, 'LIGHTING', created)
+
+@receiver(post_delete, sender=ACControl)
+@receiver(post_delete, sender=LightingControl)
+def control_deleted(sender, instance, **kwargs):
+    room_id = device_state.registry.room_of(instance.device_id)
+    if room_id is not None:
+        device_state.registry.forget(room_id)
+
+@receiver(post_save, sender=IAQSensorData)
+def iaq_reading_saved(sender, instance, created, **kwargs):
+    if not created:
+        return
+    deltas = {'online_sensors': statistics.online_status_delta(instance)}
+    if instance.temperature is not None:
+        deltas.update(temperature_sum=instance.temperature, temperature_count=1)
+    statistics.increment_room(instance.room_id, **deltas)
+    response_cache.room_changed(instance.room_id)
+    triggers.iaq_reading(instance)
+    if rules.rules_enabled():
+        rules.engine.evaluate([instance])
+
+@receiver(post_save, sender=LifeBeingSensorData)
+def life_being_reading_saved(sender, instance, created, **kwargs):
+    if created:
+        statistics.increment_room(
+            instance.room_id,
+            online_sensors=statistics.online_status_delta(instance)
+        )
+        response_cache.room_changed(instance.room_id)
+        # The one place presence reaches the tracker, so a reading is observed once however it arrived
+        occupancy.tracker.reading_saved(instance)
+
+@receiver(post_save, sender=DeviceAutomation)
+def automation_settings_saved(sender, instance, **kwargs):
+    triggers.classifier.forget_comfort(instance.room_id)
+    occupancy.tracker.settings_changed(instance.room_id)
+    if triggers.triggers_enabled():
+        triggers.schedule_room(instance.room_id)
+
+@receiver(post_save, sender=AutomationRule)
+@receiver(post_delete, sender=AutomationRule)
+def automation_rule_changed(sender, instance, **kwargs):
+    rules.rules_changed()
+
+@receiver(post_save, sender=EnergyConsumption)
+def energy_reading_saved(sender, instance, created, **kwargs):
+    if created:
+        statistics.increment_room(
+            instance.room_id,
+            power_usage_sum=instance.power_usage,
+            power_usage_count=1
+        )
+        response_cache.energy_changed(instance.room_id)
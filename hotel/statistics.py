@@ -0,0 +1,152 @@
+# statistics.py
+import logging
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Count, OuterRef, Subquery, Sum
+from django.utils import timezone
+from .models import (
+    Room,
+    FloorStatistics,
+    HotelStatistics,
+    EnergyConsumption,
+    IAQSensorData,
+    LifeBeingSensorData
+)
+
+logger = logging.getLogger(__name__)
+
+FLOOR_COUNTERS = (
+    'total_rooms', 'occupied_rooms', 'online_sensors',
+    'temperature_sum', 'temperature_count'
+)
+HOTEL_COUNTERS = (
+    'total_floors', 'total_rooms', 'occupied_rooms', 'online_sensors',
+    'power_usage_sum', 'power_usage_count'
+)
+SENSOR_MODELS = (IAQSensorData, LifeBeingSensorData)
+
+def _increment(queryset, counters, deltas):
+    """Atomically add deltas to the counter columns of a statistics queryset"""
+    updates = {
+        field: F(field) + value
+        for field, value in deltas.items()
+        if field in counters and value
+    }
+    if updates:
+        queryset.update(updated_at=timezone.now(), **updates)
+
+def increment_floor(floor_id, **deltas):
+    """Apply counter deltas to a floor and its hotel"""
+    _increment(FloorStatistics.objects.filter(floor_id=floor_id), FLOOR_COUNTERS, deltas)
+    _increment(HotelStatistics.objects.filter(hotel__floors__id=floor_id), HOTEL_COUNTERS, deltas)
+
+def increment_room(room_id, **deltas):
+    """Apply counter deltas to the floor and hotel a room belongs to"""
+    _increment(FloorStatistics.objects.filter(floor__rooms__id=room_id), FLOOR_COUNTERS, deltas)
+    _increment(HotelStatistics.objects.filter(hotel__floors__rooms__id=room_id), HOTEL_COUNTERS, deltas)
+
+def increment_hotel(hotel_id, **deltas):
+    """Apply counter deltas to a hotel only"""
+    _increment(HotelStatistics.objects.filter(hotel_id=hotel_id), HOTEL_COUNTERS, deltas)
+
+def online_status_key(reading):
+    return f"statistics:online:{reading._meta.model_name}:{reading.room_id}"
+
+def online_status_delta(reading):
+    """
+    Change in online sensor count caused by a newly stored reading. The
+    last status of each room's sensor is kept in the cache, so the
+    previous reading is only queried when the cache doesn't have it.
+    """
+    online = int(bool(reading.online_status))
+    key = online_status_key(reading)
+    try:
+        previous = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Could not read the cached online status of room {reading.room_id}: {e}")
+        previous = None
+    if previous is None:
+        previous = int(bool(type(reading).objects.filter(
+            room_id=reading.room_id
+        ).exclude(pk=reading.pk).values_list('online_status', flat=True).first()))
+    elif previous == online:
+        return 0
+    transaction.on_commit(lambda: _cache_online_status(key, online))
+    return online - previous
+
+def _cache_online_status(key, online):
+    try:
+        cache.set(key, online, timeout=None)
+    except Exception as e:
+        logger.warning(f"Could not cache online status {key}: {e}")
+
+def _count_online_sensors(rooms):
+    """Count sensors whose latest reading reports them online"""
+    online = 0
+    for model in SENSOR_MODELS:
+        latest = model.objects.filter(room=OuterRef('pk')).values('online_status')[:1]
+        online += rooms.annotate(online=Subquery(latest)).filter(online=True).count()
+    return online
+
+def _room_counts(rooms):
+    return rooms.aggregate(
+        total=Count('id'),
+        occupied=Count('id', filter=Q(is_occupied=True))
+    )
+
+def rebuild_floor_statistics(floor):
+    """Recompute a floor's counters from scratch"""
+    rooms = Room.objects.filter(floor=floor)
+    counts = _room_counts(rooms)
+    temperatures = IAQSensorData.objects.filter(
+        room__floor=floor, temperature__isnull=False
+    ).aggregate(total=Sum('temperature'), count=Count('id'))
+
+    stats, _ = FloorStatistics.objects.update_or_create(
+        floor=floor,
+        defaults={
+            'total_rooms': counts['total'],
+            'occupied_rooms': counts['occupied'],
+            'online_sensors': _count_online_sensors(rooms),
+            'temperature_sum': temperatures['total'] or 0.0,
+            'temperature_count': temperatures['count'],
+        }
+    )
+    logger.info(f"Rebuilt statistics for floor {floor.id}")
+    return stats
+
+def rebuild_hotel_statistics(hotel):
+    """Recompute a hotel's counters from scratch"""
+    rooms = Room.objects.filter(floor__hotel=hotel)
+    counts = _room_counts(rooms)
+    energy = EnergyConsumption.objects.filter(
+        room__floor__hotel=hotel
+    ).aggregate(total=Sum('power_usage'), count=Count('id'))
+
+    stats, _ = HotelStatistics.objects.update_or_create(
+        hotel=hotel,
+        defaults={
+            'total_floors': hotel.floors.count(),
+            'total_rooms': counts['total'],
+            'occupied_rooms': counts['occupied'],
+            'online_sensors': _count_online_sensors(rooms),
+            'power_usage_sum': energy['total'] or 0.0,
+            'power_usage_count': energy['count'],
+        }
+    )
+    logger.info(f"Rebuilt statistics for hotel {hotel.id}")
+    return stats
+
+def get_floor_statistics(floor):
+    """Return a floor's counters, rebuilding them if they were never built"""
+    stats = FloorStatistics.objects.filter(floor=floor).first()
+    if stats is None:
+        stats = rebuild_floor_statistics(floor)
+    return stats
+
+def get_hotel_statistics(hotel):
+    """Return a hotel's counters, rebuilding them if they were never built"""
+    stats = HotelStatistics.objects.filter(hotel=hotel).first()
+    if stats is None:
+        stats = rebuild_hotel_statistics(hotel)
+    return stats
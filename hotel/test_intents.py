@@ -0,0 +1,63 @@
+from django.test import SimpleTestCase
+from hotel.chat.intents import IntentParser
+
+class IntentParserTests(SimpleTestCase):
+    def setUp(self):
+        self.parser = IntentParser()
+
+    def test_ac_off_wins_over_mode_names(self):
+        for message in (
+            "Turn the heating off in room 201",
+            "Switch off the cooling in room 201",
+            "Turn off the AC in room 201",
+        ):
+            with self.subTest(message=message):
+                action_data = self.parser.parse(message)
+                self.assertEqual(action_data["endpoint"], "/api/rooms/by-number/201/ac/control/")
+                self.assertEqual(action_data["params"], {"mode": "OFF"})
+
+    def test_ac_settings(self):
+        for message, params in (
+            ("Set temperature to 23 degrees in room 201", {"temperature": 23, "mode": "COOL"}),
+            ("Turn on the heating in room 201", {"mode": "HEAT"}),
+        ):
+            with self.subTest(message=message):
+                self.assertEqual(self.parser.parse(message)["params"], params)
+
+    def test_setpoints_outside_the_ac_range_go_to_the_assistant(self):
+        for message in (
+            "Set the AC in room 201 to 50%",
+            "Set the AC in room 201 to 50 percent",
+            "Set the temperature in room 201 to 45 degrees",
+        ):
+            with self.subTest(message=message):
+                self.assertIsNone(self.parser.parse(message))
+
+    def test_ambiguous_messages_go_to_the_assistant(self):
+        for message in (
+            "Show energy for rooms 201 and 202",
+            "What's the status of room 201 and 202?",
+            "Energy report for room 201 or room 202",
+            "Don't turn off the AC in room 201",
+        ):
+            with self.subTest(message=message):
+                self.assertIsNone(self.parser.parse(message))
+
+    def test_energy_report_for_one_room(self):
+        action_data = self.parser.parse("Energy report for room 201 over the last 7 days")
+        self.assertEqual(action_data["endpoint"], "/api/rooms/by-number/201/energy-report/")
+        self.assertEqual(action_data["params"], {"days": 7})
+
+    def test_energy_report_periods(self):
+        for message, days in (
+            ("Energy use of room 201 for 2 weeks", 14),
+            ("Energy use of room 201 last month", 30),
+            ("Energy use of room 201 over 3 days", 3),
+        ):
+            with self.subTest(message=message):
+                self.assertEqual(self.parser.parse(message)["params"], {"days": days})
+        self.assertIsNone(self.parser.parse("Energy use of room 201 over the last 48 hours"))
+
+    def test_energy_summary_without_a_room(self):
+        action_data = self.parser.parse("How much energy did the hotel use?")
+        self.assertEqual(action_data["endpoint"], "/api/energy/summary/")
@@ -0,0 +1,180 @@
+# thermal.py
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .models import ACControl, IAQSensorData, LifeBeingSensorData, ACMode
+
+logger = logging.getLogger(__name__)
+
+# dT/dt [°C/min] = k_on * (setpoint - T) * on + c * off - k_off * T * off
+# i.e. a first order approach to the setpoint while the AC runs and to the
+# ambient temperature c / k_off while it doesn't
+PARAMETERS = 3
+DEFAULT_THETA = np.array([0.05, 0.6, 0.025])
+DEFAULT_COVARIANCE = 10.0
+FORGETTING = 0.99
+MIN_RATE, MAX_RATE = 0.005, 1.0
+MAX_GAP_MINUTES = 30
+FIRST_FIT_WINDOW = timedelta(hours=6)
+CONDITIONING_MODES = (ACMode.COOL, ACMode.HEAT, ACMode.AUTO)
+
+def cache_key(room_id):
+    return f"thermal:room:{room_id}"
+
+class ThermalState:
+    """Recursive least squares state for a batch of rooms"""
+
+    def __init__(self, room_ids, stored):
+        size = len(room_ids)
+        self.room_ids = list(room_ids)
+        self.theta = np.tile(DEFAULT_THETA, (size, 1))
+        self.covariance = np.tile(np.eye(PARAMETERS) * DEFAULT_COVARIANCE, (size, 1, 1))
+        self.last_temperature = np.full(size, np.nan)
+        self.last_timestamp = np.full(size, np.nan)
+        for i, room_id in enumerate(self.room_ids):
+            params = stored.get(cache_key(room_id))
+            if params is not None:
+                self.theta[i] = params['theta']
+                self.covariance[i] = params['covariance']
+                self.last_temperature[i] = params['last_temperature']
+                self.last_timestamp[i] = params['last_timestamp']
+
+    def update(self, features, targets, mask):
+        """One vectorized RLS step, rooms outside the mask are left untouched"""
+        p_phi = np.einsum('nij,nj->ni', self.covariance, features)
+        denominator = FORGETTING + np.einsum('ni,ni->n', features, p_phi)
+        gain = p_phi / denominator[:, None]
+        error = targets - np.einsum('ni,ni->n', features, self.theta)
+        theta = self.theta + gain * error[:, None]
+        covariance = (self.covariance - np.einsum('ni,nj->nij', gain, p_phi)) / FORGETTING
+        self.theta = np.where(mask[:, None], theta, self.theta)
+        self.covariance = np.where(mask[:, None, None], covariance, self.covariance)
+
+    def dump(self):
+        return {
+            cache_key(room_id): {
+                'theta': self.theta[i].tolist(),
+                'covariance': self.covariance[i].tolist(),
+                'last_temperature': float(self.last_temperature[i]),
+                'last_timestamp': float(self.last_timestamp[i]),
+            }
+            for i, room_id in enumerate(self.room_ids)
+        }
+
+def _ac_state(room_ids):
+    """(on, setpoint) per room from the current AC controls"""
+    controls = dict(
+        (room_id, (mode, temperature))
+        for room_id, mode, temperature in ACControl.objects.filter(
+            device__room_id__in=room_ids, device__device_type='AC'
+        ).values_list('device__room_id', 'mode', 'temperature')
+    )
+    on = np.array([controls.get(room_id, (None, 0))[0] in CONDITIONING_MODES for room_id in room_ids])
+    setpoint = np.array([controls.get(room_id, (None, np.nan))[1] for room_id in room_ids], dtype=float)
+    return on, setpoint
+
+def fit(room_ids):
+    """
+    Feed IAQ temperature readings taken since the previous fit into each
+    room's model. AC history isn't stored, so the current AC state is used
+    for the readings since the last fit; refreshing every few minutes keeps
+    that approximation close.
+    """
+    room_ids = list(room_ids)
+    if not room_ids:
+        return 0
+    state = ThermalState(room_ids, cache.get_many([cache_key(room_id) for room_id in room_ids]))
+    index = {room_id: i for i, room_id in enumerate(room_ids)}
+
+    known = state.last_timestamp[~np.isnan(state.last_timestamp)]
+    since = timezone.now() - FIRST_FIT_WINDOW
+    if len(known) == len(room_ids):
+        since = datetime.fromtimestamp(known.min(), tz=dt_timezone.utc)
+    readings = IAQSensorData.objects.filter(
+        room_id__in=room_ids, timestamp__gt=since, temperature__isnull=False
+    ).order_by('room_id', 'timestamp').values_list('room_id', 'timestamp', 'temperature')
+
+    series = [[] for _ in room_ids]
+    for room_id, timestamp, temperature in readings.iterator():
+        i = index[room_id]
+        seconds = timestamp.timestamp()
+        if seconds > (state.last_timestamp[i] if not np.isnan(state.last_timestamp[i]) else -np.inf):
+            series[i].append((seconds, temperature))
+
+    steps = max((len(samples) for samples in series), default=0)
+    if not steps:
+        return 0
+    timestamps = np.full((len(room_ids), steps), np.nan)
+    temperatures = np.full((len(room_ids), steps), np.nan)
+    for i, samples in enumerate(series):
+        if samples:
+            timestamps[i, :len(samples)], temperatures[i, :len(samples)] = zip(*samples)
+
+    on, setpoint = _ac_state(room_ids)
+    on = on & ~np.isnan(setpoint)
+    off = (~on).astype(float)
+    samples_used = 0
+    for step in range(steps):
+        temperature, timestamp = temperatures[:, step], timestamps[:, step]
+        previous = state.last_temperature
+        minutes = (timestamp - state.last_timestamp) / 60.0
+        valid = ~np.isnan(temperature) & ~np.isnan(previous) & (minutes > 0) & (minutes <= MAX_GAP_MINUTES)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            features = np.stack([
+                np.where(on, np.nan_to_num(setpoint) - previous, 0.0),
+                off,
+                -previous * off,
+            ], axis=1)
+            targets = (temperature - previous) / minutes
+        features = np.nan_to_num(features)
+        state.update(features, np.nan_to_num(targets), valid)
+        samples_used += int(valid.sum())
+
+        seen = ~np.isnan(temperature)
+        state.last_temperature = np.where(seen, temperature, state.last_temperature)
+        state.last_timestamp = np.where(seen, timestamp, state.last_timestamp)
+
+    cache.set_many(state.dump(), None)
+    logger.info(f"Thermal models refreshed for {len(room_ids)} rooms from {samples_used} samples")
+    return samples_used
+
+def load_rates(room_ids):
+    """Conditioning rate k_on (1/min) per room, defaults for rooms without a fit"""
+    stored = cache.get_many([cache_key(room_id) for room_id in room_ids])
+    rates = np.array([
+        stored[cache_key(room_id)]['theta'][0] if cache_key(room_id) in stored else DEFAULT_THETA[0]
+        for room_id in room_ids
+    ], dtype=float)
+    return np.clip(rates, MIN_RATE, MAX_RATE)
+
+def minutes_to_setpoint(temperature, setpoint, rate, tolerance=0.5):
+    """Forecast minutes until the room is within tolerance of setpoint with the AC on"""
+    gap = np.abs(temperature - setpoint)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        minutes = np.log(np.maximum(gap, tolerance) / tolerance) / rate
+    return np.where(np.isnan(temperature), np.nan, minutes)
+
+def minutes_to_expected_occupancy(rooms, horizon):
+    """
+    Minutes until each room is expected to be occupied, judged by when
+    presence was first detected at the same time of day yesterday.
+    Returns {room_id: minutes} for rooms expected within the horizon.
+    """
+    now = timezone.now()
+    window_start = now - timedelta(days=1)
+    first_presence = LifeBeingSensorData.objects.filter(
+        room=OuterRef('pk'),
+        presence_detected=True,
+        timestamp__gte=window_start,
+        timestamp__lt=window_start + horizon
+    ).order_by('timestamp').values('timestamp')
+    expected = rooms.order_by().annotate(expected=Subquery(first_presence[:1])).filter(
+        expected__isnull=False
+    ).values_list('id', 'expected')
+    return {
+        room_id: (expected_at - window_start).total_seconds() / 60.0
+        for room_id, expected_at in expected
+    }
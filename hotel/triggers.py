@@ -0,0 +1,179 @@
+# triggers.py
+import heapq
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from .automation import BatchAutomationEngine
+from .scheduler import default_worker_id
+
+logger = logging.getLogger(__name__)
+
+class ReadingClassifier:
+    """
+    Tracks the last climate state of each room so that only IAQ readings
+    that cross a threshold trigger an evaluation. States are kept
+    in memory, a restart just causes one extra evaluation per room.
+    """
+
+    def __init__(self, deadband=0.5, dim_illuminance=300.0):
+        self.deadband = deadband
+        self.dim_illuminance = dim_illuminance
+        self.climate = {}
+        self.comfort = {}
+        self.lock = threading.Lock()
+
+    def comfort_temperature(self, room_id):
+        comfort = self.comfort.get(room_id)
+        if comfort is None:
+            from .models import DeviceAutomation
+            comfort = DeviceAutomation.objects.filter(room_id=room_id).values_list(
+                'comfort_temperature', flat=True
+            ).first()
+            if comfort is None:
+                comfort = DeviceAutomation._meta.get_field('comfort_temperature').default
+            self.comfort[room_id] = comfort
+        return comfort
+
+    def forget_comfort(self, room_id):
+        self.comfort.pop(room_id, None)
+        with self.lock:
+            self.climate.pop(room_id, None)
+
+    def climate_changed(self, reading):
+        temperature, illuminance = reading.temperature, reading.illuminance
+        temperature_band = None
+        if temperature is not None:
+            comfort = self.comfort_temperature(reading.room_id)
+            if temperature > comfort + self.deadband:
+                temperature_band = 1
+            elif temperature < comfort - self.deadband:
+                temperature_band = -1
+            else:
+                temperature_band = 0
+        light_band = None if illuminance is None else illuminance < self.dim_illuminance
+
+        state = (temperature_band, light_band)
+        with self.lock:
+            previous = self.climate.get(reading.room_id)
+            self.climate[reading.room_id] = state
+        return previous != state
+
+class AutomationScheduler:
+    """
+    Debounces automation requests per room and evaluates them off the
+    ingest thread. A room is evaluated at most once per debounce window;
+    rooms that become due together are handed to the engine as one batch.
+    Readings are saved by every web worker as well as the event handler,
+    so a room is only debounced by the process holding its cache lease.
+    The lease is released when the evaluation starts, so later changes
+    schedule another one.
+    """
+
+    def __init__(self, debounce=2.0, workers=4, engine=None, worker_id=None):
+        self.debounce = debounce
+        self.worker_id = worker_id or default_worker_id()
+        self.engine = engine or BatchAutomationEngine()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='automation')
+        self.pending = {}
+        self.running = set()
+        self.heap = []
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, room_id):
+        """Request an evaluation of the room within the debounce window"""
+        with self.condition:
+            if room_id in self.pending:
+                return
+        if not self.claim(room_id):
+            return
+        with self.condition:
+            if room_id in self.pending:
+                return
+            due = time.monotonic() + self.debounce
+            self.pending[room_id] = due
+            heapq.heappush(self.heap, (due, room_id))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.loop, name='automation-scheduler', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def lease_key(self, room_id):
+        return f"automation:debounce:{room_id}"
+
+    def claim(self, room_id):
+        """Whether this process debounces the room, False if another one already does"""
+        try:
+            # Expires on its own if the holder dies before evaluating
+            return cache.add(self.lease_key(room_id), self.worker_id, timeout=math.ceil(self.debounce) + 60)
+        except Exception as e:
+            logger.warning(f"Could not take the automation lease for room {room_id}: {e}")
+            return True
+
+    def release(self, room_ids):
+        try:
+            cache.delete_many([self.lease_key(room_id) for room_id in room_ids])
+        except Exception as e:
+            logger.warning(f"Could not release automation leases for rooms {room_ids}: {e}")
+
+    def loop(self):
+        while True:
+            with self.condition:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    timeout = self.heap[0][0] - time.monotonic() if self.heap else None
+                    self.condition.wait(timeout)
+
+                now = time.monotonic()
+                batch = []
+                while self.heap and self.heap[0][0] <= now:
+                    due, room_id = heapq.heappop(self.heap)
+                    if room_id in self.running:
+                        # Still being evaluated, look again after another window
+                        heapq.heappush(self.heap, (now + self.debounce, room_id))
+                        self.pending[room_id] = now + self.debounce
+                        continue
+                    del self.pending[room_id]
+                    batch.append(room_id)
+                self.running.update(batch)
+
+            if batch:
+                self.executor.submit(self.evaluate, batch)
+
+    def evaluate(self, room_ids):
+        # Changes from here on may not be seen by this evaluation, so they schedule another
+        self.release(room_ids)
+        close_old_connections()
+        try:
+            self.engine.run(room_ids)
+        except Exception as e:
+            logger.error(f"Automation evaluation failed for rooms {room_ids}: {e}")
+        finally:
+            close_old_connections()
+            with self.condition:
+                self.running.difference_update(room_ids)
+
+classifier = ReadingClassifier()
+scheduler = AutomationScheduler(
+    debounce=getattr(settings, 'AUTOMATION_DEBOUNCE_SECONDS', 2.0),
+    workers=getattr(settings, 'AUTOMATION_WORKERS', 4)
+)
+
+def triggers_enabled():
+    return getattr(settings, 'AUTOMATION_TRIGGERS_ENABLED', True)
+
+def schedule_room(room_id):
+    """Schedule an evaluation once the current transaction has committed"""
+    transaction.on_commit(lambda: scheduler.schedule(room_id))
+
+def occupancy_changed(room):
+    if triggers_enabled():
+        schedule_room(room.pk)
+
+def iaq_reading(reading):
+    if triggers_enabled() and classifier.climate_changed(reading):
+        schedule_room(reading.room_id)
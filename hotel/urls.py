@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested.routers import NestedDefaultRouter
-from . import views
+from . import views, async_views
 
 # Main router
 router = DefaultRouter()
 router.register(r'hotels', views.HotelViewSet, basename='hotel')
+router.register(r'automation-rules', views.AutomationRuleViewSet, basename='automation-rule')
 
 # Hotel -> Floor -> Room hierarchy
 hotel_router = NestedDefaultRouter(router, r'hotels', lookup='hotel')  # Changed this line
@@ -22,28 +23,25 @@ urlpatterns = [
     # Health check
     path('health/', views.health_check, name='health-check'),
 
-    # Room access by number endpoints
-    path('rooms/by-number/<str:number>/status/', 
-         views.RoomViewSet.as_view({'get': 'get_status_by_number'}),
+    # Process metrics (automation cycles and other internal timings)
+    path('metrics/', views.metrics_view, name='metrics'),
+
+    # Room access by number endpoints (async, read paths run on the DB thread pool)
+    path('rooms/by-number/<str:number>/status/',
+         async_views.room_status_by_number,
          name='room-status-by-number'),
          
-    path('rooms/by-number/<str:number>/energy-report/', 
-         views.RoomViewSet.as_view({'get': 'get_energy_report_by_number'}),
+    path('rooms/by-number/<str:number>/energy-report/',
+         async_views.room_energy_report_by_number,
          name='room-energy-report-by-number'),
 
     # Sensor data endpoints with room number
     path('rooms/by-number/<str:number>/data/iaq/',
-         views.IAQSensorDataViewSet.as_view({
-             'get': 'list_by_number',
-             'post': 'create_by_number'
-         }),
+         async_views.room_iaq_data_by_number,
          name='room-iaq-data-by-number'),
 
     path('rooms/by-number/<str:number>/data/life-being/',
-         views.LifeBeingSensorDataViewSet.as_view({
-             'get': 'list_by_number',
-             'post': 'create_by_number'
-         }),
+         async_views.room_life_being_data_by_number,
          name='room-life-being-data-by-number'),
 
     # Device control by room number
@@ -51,6 +49,16 @@ urlpatterns = [
           views.DeviceControlViewSet.as_view({'post': 'control_ac_by_room_number'}),
           name='ac-control-by-room-number'),
 
+    # Bulk device control for a room list, floor or hotel
+    path('devices/bulk-control/',
+         views.DeviceControlViewSet.as_view({'post': 'bulk_control'}),
+         name='device-bulk-control'),
+
+    # Batch automation for all rooms, a room list, floor or hotel
+    path('automation/run/',
+         views.AutomationViewSet.as_view({'post': 'run'}),
+         name='automation-run'),
+
     # Energy endpoints
     path('energy/summary/',
          views.EnergyConsumptionViewSet.as_view({'get': 'summary'}),
@@ -5,7 +5,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Avg, Sum, Count
+from django.db.models import Avg, Sum, Count, Prefetch
 from datetime import timedelta
 import logging
 from django.views.generic import TemplateView
@@ -18,6 +18,7 @@ from .models import (
     ACControl,
     LightingControl,
     DeviceAutomation,
+    AutomationRule,
     EnergyConsumption,
     IAQSensorData,
     LifeBeingSensorData,
@@ -25,7 +26,27 @@ from .models import (
     ACMode
 )
 
+from .reports import get_room_status_data, get_energy_report_data
+from .statistics import get_floor_statistics, get_hotel_statistics
+from .fast_serializers import (
+    iaq_sensor_data_reader,
+    life_being_sensor_data_reader,
+    energy_consumption_reader
+)
+from .device_control import (
+    validate_ac_settings,
+    resolve_target_rooms,
+    validate_target,
+    bulk_control_ac,
+    ac_command_topic,
+    ac_command_payload,
+    publish_device_commands,
+    set_device_status
+)
+from .automation import BatchAutomationEngine
+from .metrics import metrics, published
 from .serializers import (
+    requested_fieldsets,
     HotelSerializer,
     FloorSerializer,
     RoomSerializer,
@@ -34,8 +55,8 @@ from .serializers import (
     DetailedRoomSerializer,
     RoomDeviceSerializer,
     ACControlSerializer,
-    LightingControlSerializer,
     DeviceAutomationSerializer,
+    AutomationRuleSerializer,
     EnergyConsumptionSerializer,
     IAQSensorDataSerializer,
     LifeBeingSensorDataSerializer
@@ -64,10 +85,50 @@ def health_check(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-class HotelViewSet(viewsets.ModelViewSet):
-    queryset = Hotel.objects.all()
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def metrics_view(request):
+    """Counters and timings collected by this process, plus those other processes publish"""
+    snapshot = metrics.snapshot()
+    snapshot['processes'] = published()
+    return Response(snapshot)
+
+class ExpansionMixin:
+    """Prefetch only the nested data a detail request will actually serialize"""
+
+    def includes(self, name, top_level=False):
+        fields, expand = requested_fieldsets(self.request)
+        if top_level and fields is not None and name not in fields:
+            return False
+        return expand is None or name in expand
+
+    def room_prefetches(self, prefix='', top_level=False):
+        lookups = []
+        if self.includes('devices', top_level):
+            lookups.append(Prefetch(
+                prefix + 'devices',
+                queryset=RoomDevice.objects.select_related('ac_control', 'lighting_control')
+            ))
+        if self.includes('automation', top_level):
+            lookups.append(prefix + 'automation')
+        return lookups
+
+    def floor_prefetches(self, prefix='', top_level=False):
+        lookups = []
+        if self.includes('rooms', top_level):
+            lookups.append(prefix + 'rooms')
+            lookups.extend(self.room_prefetches(prefix + 'rooms__'))
+        return lookups
+
+class HotelViewSet(ExpansionMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        queryset = Hotel.objects.all()
+        if self.action == 'retrieve' and self.includes('floors', top_level=True):
+            queryset = queryset.prefetch_related('floors', *self.floor_prefetches('floors__'))
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return DetailedHotelSerializer
@@ -76,24 +137,26 @@ class HotelViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def statistics(self, request, pk=None):
         hotel = self.get_object()
-        rooms = Room.objects.filter(floor__hotel=hotel)
+        stats = get_hotel_statistics(hotel)
 
         return Response({
-            'total_rooms': rooms.count(),
-            'occupied_rooms': rooms.filter(is_occupied=True).count(),
-            'total_floors': hotel.floors.count(),
-            'average_energy_consumption': EnergyConsumption.objects.filter(
-                room__floor__hotel=hotel
-            ).aggregate(avg=Avg('power_usage'))['avg']
+            'total_rooms': stats.total_rooms,
+            'occupied_rooms': stats.occupied_rooms,
+            'total_floors': stats.total_floors,
+            'online_sensors': stats.online_sensors,
+            'average_energy_consumption': stats.average_energy_consumption
         })
 
-class FloorViewSet(viewsets.ModelViewSet):
+class FloorViewSet(ExpansionMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
 
     def get_queryset(self):
+        queryset = Floor.objects.all()
         if 'hotel_pk' in self.kwargs:
-            return Floor.objects.filter(hotel_id=self.kwargs['hotel_pk'])
-        return Floor.objects.all()
+            queryset = queryset.filter(hotel_id=self.kwargs['hotel_pk'])
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(*self.floor_prefetches(top_level=True))
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -103,23 +166,25 @@ class FloorViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def statistics(self, request, hotel_pk=None, pk=None):
         floor = self.get_object()
-        rooms = floor.rooms.all()
+        stats = get_floor_statistics(floor)
 
         return Response({
-            'total_rooms': rooms.count(),
-            'occupied_rooms': rooms.filter(is_occupied=True).count(),
-            'average_temperature': IAQSensorData.objects.filter(
-                room__floor=floor
-            ).aggregate(avg=Avg('temperature'))['avg']
+            'total_rooms': stats.total_rooms,
+            'occupied_rooms': stats.occupied_rooms,
+            'online_sensors': stats.online_sensors,
+            'average_temperature': stats.average_temperature
         })
 
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(ExpansionMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
 
     def get_queryset(self):
+        queryset = Room.objects.all()
         if 'floor_pk' in self.kwargs:
-            return Room.objects.filter(floor_id=self.kwargs['floor_pk'])
-        return Room.objects.all()
+            queryset = queryset.filter(floor_id=self.kwargs['floor_pk'])
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(*self.room_prefetches(top_level=True))
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -128,21 +193,7 @@ class RoomViewSet(viewsets.ModelViewSet):
 
     def _get_room_status_data(self, room):
         """Helper method to get room status data"""
-        latest_iaq = room.iaq_data.order_by('-timestamp').first()
-        latest_life = room.life_being_data.order_by('-timestamp').first()
-        devices = room.devices.all()
-        ac = devices.filter(device_type='AC').first()
-        lighting = devices.filter(device_type='LIGHTING').first()
-
-        return {
-            'room_number': room.number,
-            'occupied': room.is_occupied,
-            'last_cleaned': room.last_cleaned,
-            'environmental_data': IAQSensorDataSerializer(latest_iaq).data if latest_iaq else None,
-            'presence_data': LifeBeingSensorDataSerializer(latest_life).data if latest_life else None,
-            'ac_status': ACControlSerializer(ac.ac_control).data if ac and hasattr(ac, 'ac_control') else None,
-            'lighting_status': LightingControlSerializer(lighting.lighting_control).data if lighting and hasattr(lighting, 'lighting_control') else None,
-        }
+        return get_room_status_data(room)
 
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
@@ -164,19 +215,7 @@ class RoomViewSet(viewsets.ModelViewSet):
 
     def _get_energy_report_data(self, room, days=1):
         """Helper method to get energy report data"""
-        start_date = timezone.now() - timedelta(days=days)
-        consumption = EnergyConsumption.objects.filter(
-            room=room,
-            timestamp__gte=start_date
-        )
-
-        return {
-            'total_consumption': consumption.aggregate(Sum('power_usage'))['power_usage__sum'],
-            'average_daily_consumption': consumption.values('device__device_type').annotate(
-                avg_usage=Avg('power_usage'),
-                total_usage=Sum('power_usage')
-            ).order_by('device__device_type')
-        }
+        return get_energy_report_data(room, days)
 
     @action(detail=True, methods=['get'])
     def energy_report(self, request, pk=None):
@@ -217,8 +256,10 @@ class DeviceControlViewSet(viewsets.ModelViewSet):
             
             if serializer.is_valid():
                 serializer.save()
-                device.status = DeviceStatus.ON if request_data.get('mode') != 'OFF' else DeviceStatus.OFF
-                device.save()
+                set_device_status(device, DeviceStatus.ON if request_data.get('mode') != 'OFF' else DeviceStatus.OFF)
+                publish_device_commands([
+                    (ac_command_topic(room.number), ac_command_payload(ac_control, device.id))
+                ])
 
                 return Response({
                     "status": "success",
@@ -265,8 +306,10 @@ class DeviceControlViewSet(viewsets.ModelViewSet):
                 
                 if serializer.is_valid():
                     serializer.save()
-                    device.status = DeviceStatus.ON if request.data.get('mode') != 'OFF' else DeviceStatus.OFF
-                    device.save()
+                    set_device_status(device, DeviceStatus.ON if request.data.get('mode') != 'OFF' else DeviceStatus.OFF)
+                    publish_device_commands([
+                        (ac_command_topic(room.number), ac_command_payload(ac_control, device.id))
+                    ])
 
                     return Response({
                         "status": "success",
@@ -317,16 +360,10 @@ class DeviceControlViewSet(viewsets.ModelViewSet):
             
             if serializer.is_valid():
                 serializer.save()
-                device.status = DeviceStatus.ON if request.data.get('mode') != 'OFF' else DeviceStatus.OFF
-                device.save()
-
-                # Get the latest IAQ reading
-                latest_iaq = room.iaq_data.order_by('-timestamp').first()
-                if latest_iaq:
-                    # Directly set the temperature without gradual change
-                    target_temp = float(request.data.get('temperature', 24.0))
-                    latest_iaq.temperature = target_temp
-                    latest_iaq.save()
+                set_device_status(device, DeviceStatus.ON if request.data.get('mode') != 'OFF' else DeviceStatus.OFF)
+                publish_device_commands([
+                    (ac_command_topic(room.number), ac_command_payload(ac_control, device.id))
+                ])
 
                 return Response({
                     "status": "success",
@@ -352,8 +389,69 @@ class DeviceControlViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class IAQSensorDataViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk-control')
+    def bulk_control(self, request):
+        """Apply the same AC settings to a list of rooms, a floor or a hotel"""
+        target = {key: request.data.get(key) for key in ('rooms', 'floor', 'hotel')}
+        if all(value is None for value in target.values()):
+            return Response(
+                {"error": "Provide a target: rooms, floor or hotel."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        error = validate_target(**target)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        ac_settings = request.data.get('settings')
+        if not isinstance(ac_settings, dict):
+            return Response(
+                {"error": "Settings must be an object."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ac_settings, errors = validate_ac_settings(ac_settings)
+        if errors:
+            return Response(
+                {"error": "Invalid settings", "details": errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            results = bulk_control_ac(resolve_target_rooms(**target), ac_settings)
+        except Exception as e:
+            logger.error(f"Bulk device control error: {str(e)}")
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        if target['rooms'] is not None:
+            found = {result['room_number'] for result in results}
+            results.extend(
+                {"room_number": str(number), "status": "error", "error": f"Room {number} not found."}
+                for number in target['rooms'] if str(number) not in found
+            )
+
+        return Response({
+            "status": "success",
+            "updated": sum(1 for result in results if result['status'] == 'success'),
+            "results": results
+        })
+
+class FastReadMixin:
+    """List rows through a values_list based reader instead of the ModelSerializer"""
+    read_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        rows = self.read_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.read_serializer.to_representation(page))
+        return Response(self.read_serializer.to_representation(rows))
+
+class IAQSensorDataViewSet(FastReadMixin, viewsets.ModelViewSet):
     serializer_class = IAQSensorDataSerializer
+    read_serializer = iaq_sensor_data_reader
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -367,8 +465,7 @@ class IAQSensorDataViewSet(viewsets.ModelViewSet):
         try:
             room = Room.objects.get(number=number)
             queryset = self.get_queryset().filter(room=room)
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data)
+            return Response(self.read_serializer.to_representation(queryset))
         except Room.DoesNotExist:
             return Response(
                 {"error": f"Room {number} not found."},
@@ -390,8 +487,9 @@ class IAQSensorDataViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class LifeBeingSensorDataViewSet(viewsets.ModelViewSet):
+class LifeBeingSensorDataViewSet(FastReadMixin, viewsets.ModelViewSet):
     serializer_class = LifeBeingSensorDataSerializer
+    read_serializer = life_being_sensor_data_reader
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -405,8 +503,7 @@ class LifeBeingSensorDataViewSet(viewsets.ModelViewSet):
         try:
             room = Room.objects.get(number=number)
             queryset = self.get_queryset().filter(room=room)
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data)
+            return Response(self.read_serializer.to_representation(queryset))
         except Room.DoesNotExist:
             return Response(
                 {"error": f"Room {number} not found."},
@@ -428,8 +525,9 @@ class LifeBeingSensorDataViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class EnergyConsumptionViewSet(viewsets.ModelViewSet):
+class EnergyConsumptionViewSet(FastReadMixin, viewsets.ModelViewSet):
     serializer_class = EnergyConsumptionSerializer
+    read_serializer = energy_consumption_reader
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -474,38 +572,55 @@ class AutomationViewSet(viewsets.ModelViewSet):
         return DeviceAutomation.objects.all()
 
     @action(detail=True, methods=['post'])
-    def apply_automation(self, request, pk=None):
+    def apply_automation(self, request, pk=None, **kwargs):
         """Manually trigger automation for a room"""
         automation = self.get_object()
-        room = automation.room
 
         try:
-            # Get latest sensor data
-            latest_presence = room.life_being_data.latest('timestamp')
-            latest_iaq = room.iaq_data.latest('timestamp')
-
-            # Apply automation logic
-            if latest_presence.presence_detected:
-                # Room is occupied
-                if hasattr(room, 'devices'):
-                    for device in room.devices.all():
-                        if device.device_type == 'AC' and automation.ac_auto_adjust:
-                            ac_control = device.ac_control
-                            ac_control.temperature = automation.comfort_temperature
-                            ac_control.save()
-                        elif device.device_type == 'LIGHTING' and automation.lighting_auto_adjust:
-                            lighting_control = device.lighting_control
-                            if latest_iaq.illuminance < 300:
-                                lighting_control.brightness = 100
-                            else:
-                                lighting_control.brightness = 50
-                            lighting_control.save()
-
-            return Response({"status": "Automation applied successfully"})
+            result = BatchAutomationEngine().run([automation.room_id])
+            return Response({"status": "Automation applied successfully", **result})
 
         except Exception as e:
             logger.error(f"Automation error: {str(e)}")
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+    @action(detail=False, methods=['post'])
+    def run(self, request, *args, **kwargs):
+        """Run automation for every room, or for a room list, floor or hotel"""
+        target = {key: request.data.get(key) for key in ('rooms', 'floor', 'hotel')}
+        error = validate_target(**target)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        rooms = resolve_target_rooms(**target)
+        if 'room_pk' in self.kwargs:
+            rooms = rooms.filter(pk=self.kwargs['room_pk'])
+
+        try:
+            result = BatchAutomationEngine().run(rooms)
+            return Response({"status": "Automation applied successfully", **result})
+
+        except Exception as e:
+            logger.error(f"Automation error: {str(e)}")
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class AutomationRuleViewSet(viewsets.ModelViewSet):
+    """
+    API endpoint for threshold automation rules.
+    Changes are picked up by the rule engine without a restart.
+    """
+    serializer_class = AutomationRuleSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        queryset = AutomationRule.objects.all()
+        hotel = self.request.query_params.get('hotel')
+        if hotel is not None:
+            queryset = queryset.filter(hotel_id=hotel)
+        return queryset
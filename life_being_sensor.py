@@ -1,12 +1,10 @@
 # life_being_sensor.py
 
-import requests
 import time
-import json
 import random
 import os
 import logging
-import paho.mqtt.publish as mqtt_publish
+from edge_publisher import HTTP_TIMEOUT, http_session, publisher
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,12 +12,13 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Environment variables
 ROOM_ID = os.getenv('ROOM_ID', '1')
 API_URL = f"http://web:8000/api/rooms/{ROOM_ID}/data/life-being/"
-MQTT_BROKER = os.getenv('MQTT_BROKER', 'mqtt')
-MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
 MQTT_TOPIC = f"hotel/room/{ROOM_ID}/life_being"
 
 def simulate_life_being_sensor():
     """Simulate life being sensor data."""
+    # Connections are set up once and reused for every reading
+    session = http_session()
+    mqtt_publisher = publisher()
     while True:
         # Simulate sensor data
         presence_detected = random.choice([True, False])
@@ -42,7 +41,7 @@ def simulate_life_being_sensor():
             logging.info(f"Sending data to {API_URL}")
             logging.info(f"Data: {data}")
 
-            response = requests.post(API_URL, json=data)
+            response = session.post(API_URL, json=data, timeout=HTTP_TIMEOUT)
 
             if response.status_code == 201:
                 logging.info(f"Response status: {response.status_code}")
@@ -56,16 +55,10 @@ def simulate_life_being_sensor():
             logging.error(f"Error sending data to API: {e}")
 
         # Publish to MQTT
-        try:
-            mqtt_publish.single(
-                topic=MQTT_TOPIC,
-                payload=json.dumps(data),
-                hostname=MQTT_BROKER,
-                port=MQTT_PORT
-            )
+        if mqtt_publisher.publish(MQTT_TOPIC, data):
             logging.info(f"Published to MQTT topic {MQTT_TOPIC}: {data}")
-        except Exception as e:
-            logging.error(f"Error publishing to MQTT: {e}")
+        else:
+            logging.error(f"Error publishing to MQTT topic {MQTT_TOPIC}")
 
         # Sleep for 15 seconds to reduce frequency and avoid rate limiting
         time.sleep(15)
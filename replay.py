@@ -0,0 +1,169 @@
+# replay.py
+
+import argparse
+import csv
+import logging
+import time
+from datetime import datetime
+from data_fetcher import parse_rooms
+from edge_publisher import publisher
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('replay')
+
+SENSOR_TYPES = ('iaq', 'life_being')
+
+def parse_value(datapoint, value):
+    """CSV values are numbers or strings; status strings become the booleans the event stream expects"""
+    if datapoint == 'online_status':
+        return value.strip().lower() in ('online', 'true', '1')
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def read_rows(path):
+    """Yield (timestamp, device_id, datapoint, value) from a long-format recording, one line at a time"""
+    with open(path, newline='') as recording:
+        for row in csv.DictReader(recording):
+            try:
+                timestamp = datetime.fromisoformat(row['datetime']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Skipping malformed row: {row}")
+                continue
+            yield timestamp, row['device_id'], row['datapoint'], parse_value(row['datapoint'], row['value'])
+
+def grouped(rows):
+    """Group consecutive rows with the same timestamp, so a device's simultaneous datapoints go out together"""
+    group = []
+    for row in rows:
+        if group and row[0] != group[0][0]:
+            yield group
+            group = []
+        group.append(row)
+    if group:
+        yield group
+
+class Replay:
+    """
+    Republishes a recorded datapoint stream to MQTT at the recorded pace,
+    or `speed` times faster (0 for as fast as possible). Each device keeps
+    its latest datapoints, and every change publishes the device's full
+    reading, like the live sensors do, to the rooms the device is mapped to.
+    """
+
+    def __init__(self, devices, default_rooms, speed=1.0):
+        # device_id -> (rooms, sensor type)
+        self.devices = devices
+        self.default_rooms = default_rooms
+        self.speed = speed
+        self.publisher = publisher()
+        self.readings = {}
+        self.rows = 0
+        self.published = 0
+        self.dropped = 0
+        self.max_lag = 0.0
+
+    def target(self, device_id):
+        if device_id in self.devices:
+            return self.devices[device_id]
+        if device_id in SENSOR_TYPES:
+            return self.default_rooms, device_id
+        return None, None
+
+    def play(self, path, loops=1):
+        if not self.publisher.wait_connected():
+            logger.warning("MQTT broker not reachable yet, readings are dropped until it is")
+        started = time.monotonic()
+        # Recording time at wall clock `started`, moved on by the recording's length on every loop
+        offset = None
+        for _ in range(loops):
+            first = last = None
+            for group in grouped(read_rows(path)):
+                timestamp = group[0][0]
+                if first is None:
+                    first = timestamp
+                    if offset is None:
+                        offset = first
+                last = timestamp
+                self.wait(started + (timestamp - offset) / self.speed if self.speed else None)
+                self.apply(group)
+            if first is not None:
+                # The next loop starts a second after this one ended
+                offset -= last - first + 1
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Replayed {self.rows} datapoints as {self.published} messages in {elapsed:.1f}s "
+            f"({self.dropped} dropped, max lag {self.max_lag * 1000:.0f} ms)"
+        )
+
+    def wait(self, due):
+        if due is None:
+            return
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            self.max_lag = max(self.max_lag, -delay)
+
+    def apply(self, group):
+        changed = []
+        for _, device_id, datapoint, value in group:
+            self.rows += 1
+            reading = self.readings.setdefault(device_id, {})
+            reading[datapoint] = value
+            if datapoint == 'presence_state':
+                reading['presence_detected'] = str(value).lower() not in ('unoccupied', 'none', '')
+            if device_id not in changed:
+                changed.append(device_id)
+        for device_id in changed:
+            rooms, sensor_type = self.target(device_id)
+            if not rooms:
+                continue
+            for room in rooms:
+                data = dict(self.readings[device_id], room=room)
+                if self.publisher.publish(f"hotel/room/{room}/{sensor_type}", data):
+                    self.published += 1
+                else:
+                    self.dropped += 1
+
+def parse_device_map(items, default_rooms):
+    """['sensor-7=101-110:iaq'] -> {'sensor-7': (['101', ..., '110'], 'iaq')}"""
+    devices = {}
+    for item in items:
+        device_id, _, target = item.partition('=')
+        rooms, _, sensor_type = target.partition(':')
+        sensor_type = sensor_type or device_id
+        if sensor_type not in SENSOR_TYPES:
+            raise ValueError(f"Unknown sensor type for {device_id}, expected one of {', '.join(SENSOR_TYPES)}")
+        devices[device_id] = (parse_rooms(rooms) if rooms else default_rooms, sensor_type)
+    return devices
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded datapoint stream to MQTT')
+    parser.add_argument('path', nargs='?', default='room_iot_data.csv',
+                        help='CSV with datetime, device_id, datapoint and value columns')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed, 0 for as fast as possible')
+    parser.add_argument('--rooms', default='1', help='Rooms unmapped devices are replayed to, e.g. 101-130,140')
+    parser.add_argument('--map', action='append', default=[], metavar='DEVICE=ROOMS[:TYPE]',
+                        help='Rooms and sensor type of a device, e.g. sensor-7=101-110:iaq')
+    parser.add_argument('--loops', type=int, default=1, help='Play the recording this many times')
+    args = parser.parse_args()
+
+    default_rooms = parse_rooms(args.rooms)
+    try:
+        devices = parse_device_map(args.map, default_rooms)
+    except ValueError as e:
+        parser.error(str(e))
+    replay = Replay(devices, default_rooms, speed=args.speed)
+    try:
+        replay.play(args.path, loops=args.loops)
+    except KeyboardInterrupt:
+        pass
+    # Let the last messages leave before the process exits
+    time.sleep(1)
+    replay.publisher.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# simulator.py
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import aiohttp
+from edge_publisher import MQTTPublisher, async_http_session
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('simulator')
+
+API_BASE_URL = os.getenv('API_BASE_URL', 'http://web:8000')
+# Topics devices receive commands on; with --ack-commands they are acknowledged on <topic>/ack,
+# as the dispatcher expects when MQTT_COMMAND_ACKS is enabled
+COMMAND_TOPICS = ('hotel/room/+/ac', 'hotel/room/+/lighting')
+
+# Ranges of the numeric readings, as in iaq_sensor.py
+IAQ_RANGES = {
+    'temperature': (18.0, 26.0),
+    'humidity': (30.0, 70.0),
+    'co2': (400.0, 1000.0),
+    'tvoc': (0.0, 1.0),
+    'pm25': (0.0, 100.0),
+    'noise': (30.0, 60.0),
+    'illuminance': (100.0, 1000.0),
+}
+LIFE_BEING_RANGES = {
+    'motion_level': (0, 100),
+    'sensitivity': (0.5, 1.0),
+}
+
+class Distribution:
+    """Draws readings in [low, high]: uniform, normal around the middle, or a random walk per room"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.previous = {}
+
+    def draw(self, key, low, high):
+        if self.kind == 'normal':
+            value = random.gauss((low + high) / 2, (high - low) / 6)
+        elif self.kind == 'walk':
+            value = self.previous.get(key)
+            if value is None:
+                value = random.uniform(low, high)
+            value += random.gauss(0, (high - low) * 0.02)
+            self.previous[key] = value
+        else:
+            value = random.uniform(low, high)
+        return min(max(value, low), high)
+
+def iaq_reading(room_id, distribution):
+    data = {
+        name: round(distribution.draw((room_id, name), low, high), 2)
+        for name, (low, high) in IAQ_RANGES.items()
+    }
+    data.update({'room': room_id, 'online_status': True, 'device_status': 'operational'})
+    return data
+
+def life_being_reading(room_id, distribution):
+    presence_detected = random.random() < 0.5
+    return {
+        'room': room_id,
+        'presence_detected': presence_detected,
+        'motion_level': round(distribution.draw((room_id, 'motion_level'), *LIFE_BEING_RANGES['motion_level']))
+        if presence_detected else 0,
+        'presence_state': 'occupied' if presence_detected else 'unoccupied',
+        'sensitivity': round(distribution.draw((room_id, 'sensitivity'), *LIFE_BEING_RANGES['sensitivity']), 2),
+        'online_status': True,
+    }
+
+# sensor type: (reading, MQTT topic suffix, API path suffix)
+SENSORS = {
+    'iaq': (iaq_reading, 'iaq', 'iaq'),
+    'life_being': (life_being_reading, 'life_being', 'life-being'),
+}
+
+class Stats:
+    def __init__(self):
+        self.readings = 0
+        self.published = 0
+        self.dropped = 0
+        self.posted = 0
+        self.post_errors = 0
+        self.post_seconds = 0.0
+        self.late = 0
+        self.acks = 0
+
+    def line(self, elapsed):
+        average = self.post_seconds / self.posted * 1000 if self.posted else 0
+        return (
+            f"{self.readings} readings ({self.readings / elapsed:.1f}/s), {self.published} published, "
+            f"{self.dropped} dropped, {self.posted} posted (avg {average:.1f} ms, {self.post_errors} errors), "
+            f"{self.late} late, {self.acks} commands acked"
+        )
+
+class Simulator:
+    """
+    Simulates the sensors of many rooms in one process. Every (room, sensor)
+    pair is a task on one event loop, sending its readings over a single
+    persistent MQTT connection and, optionally, a shared pool of HTTP
+    connections to the API, so one machine can generate a whole hotel's load.
+    """
+
+    def __init__(self, rooms, sensors, distribution, jitter=0.1, qos=0, post=False,
+                 http_connections=100, ack_commands=False):
+        self.rooms = rooms
+        self.sensors = sensors
+        self.distribution = distribution
+        self.jitter = jitter
+        self.qos = qos
+        self.post = post
+        self.http_connections = http_connections
+        self.ack_commands = ack_commands
+        self.stats = Stats()
+        self.publisher = None
+        self.session = None
+        self.started = time.monotonic()
+
+    def connect(self):
+        self.publisher = MQTTPublisher(qos=self.qos)
+        if self.ack_commands:
+            for topic in COMMAND_TOPICS:
+                self.publisher.subscribe(topic, self.on_message, qos=1)
+        self.publisher.start()
+
+    def on_message(self, client, userdata, msg):
+        """Acknowledge device commands like the real devices do"""
+        try:
+            command_id = json.loads(msg.payload.decode()).get('command_id')
+        except (ValueError, AttributeError):
+            return
+        if command_id:
+            client.publish(f"{msg.topic}/ack", json.dumps({'command_id': command_id}), qos=1)
+            self.stats.acks += 1
+
+    async def run(self, duration=None):
+        self.started = time.monotonic()
+        self.connect()
+        async with async_http_session(limit=self.http_connections) as self.session:
+            tasks = [
+                asyncio.create_task(self.sensor(room_id, sensor_type, interval))
+                for room_id in self.rooms
+                for sensor_type, interval in self.sensors.items()
+            ]
+            tasks.append(asyncio.create_task(self.report()))
+            logger.info(f"Simulating {len(self.rooms)} rooms, {len(tasks) - 1} sensors")
+            try:
+                await asyncio.wait(tasks, timeout=duration)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        self.publisher.stop()
+
+    async def sensor(self, room_id, sensor_type, interval):
+        reading, topic_suffix, api_suffix = SENSORS[sensor_type]
+        topic = f"hotel/room/{room_id}/{topic_suffix}"
+        url = f"{API_BASE_URL}/api/rooms/{room_id}/data/{api_suffix}/"
+        loop = asyncio.get_running_loop()
+        # Spread the first readings over one interval instead of sending them all at once
+        due = loop.time() + random.uniform(0, interval)
+        while True:
+            await asyncio.sleep(max(due - loop.time(), 0))
+            if loop.time() - due > interval:
+                self.stats.late += 1
+            data = reading(room_id, self.distribution)
+            self.stats.readings += 1
+            self.publish(topic, data)
+            if self.post:
+                await self.send(url, data)
+            due += interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def publish(self, topic, data):
+        if self.publisher.publish(topic, data):
+            self.stats.published += 1
+        else:
+            self.stats.dropped += 1
+
+    async def send(self, url, data):
+        started = time.perf_counter()
+        try:
+            async with self.session.post(url, json=data) as response:
+                await response.read()
+                if response.status == 201:
+                    self.stats.posted += 1
+                    self.stats.post_seconds += time.perf_counter() - started
+                else:
+                    self.stats.post_errors += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats.post_errors += 1
+            logger.debug(f"Error sending data to {url}: {e}")
+
+    async def report(self, every=10):
+        while True:
+            await asyncio.sleep(every)
+            logger.info(self.stats.line(time.monotonic() - self.started))
+
+def parse_sensors(value, default_interval):
+    """'iaq:15,life_being:30' -> {'iaq': 15.0, 'life_being': 30.0}"""
+    sensors = {}
+    for item in value.split(','):
+        name, _, interval = item.strip().partition(':')
+        if name not in SENSORS:
+            raise ValueError(f"Unknown sensor type {name}, expected one of {', '.join(SENSORS)}")
+        sensors[name] = float(interval) if interval else default_interval
+    return sensors
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the sensors of many rooms from one process')
+    parser.add_argument('--rooms', type=int, default=int(os.getenv('SIM_ROOMS', 100)), help='Number of rooms')
+    parser.add_argument('--first-room', type=int, default=int(os.getenv('SIM_FIRST_ROOM', 1)),
+                        help='ID of the first room, rooms are numbered consecutively')
+    parser.add_argument('--sensors', default=os.getenv('SIM_SENSORS', 'iaq,life_being'),
+                        help='Sensor types with optional intervals in seconds, e.g. iaq:15,life_being:30')
+    parser.add_argument('--interval', type=float, default=15.0, help='Default seconds between readings')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Random variation of each interval, as a fraction')
+    parser.add_argument('--distribution', choices=('uniform', 'normal', 'walk'), default='uniform')
+    parser.add_argument('--qos', type=int, choices=(0, 1, 2), default=0)
+    parser.add_argument('--post', action='store_true', help='Also POST readings to the API')
+    parser.add_argument('--http-connections', type=int, default=100)
+    parser.add_argument('--ack-commands', action='store_true', help='Acknowledge AC and lighting commands')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    try:
+        sensors = parse_sensors(args.sensors, args.interval)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.seed is not None:
+        random.seed(args.seed)
+    simulator = Simulator(
+        rooms=[str(room_id) for room_id in range(args.first_room, args.first_room + args.rooms)],
+        sensors=sensors,
+        distribution=Distribution(args.distribution),
+        jitter=args.jitter,
+        qos=args.qos,
+        post=args.post,
+        http_connections=args.http_connections,
+        ack_commands=args.ack_commands
+    )
+    try:
+        asyncio.run(simulator.run(args.duration))
+    except KeyboardInterrupt:
+        pass
+    logger.info(f"Stopped: {simulator.stats.line(time.monotonic() - simulator.started)}")
+
+if __name__ == '__main__':
+    main()
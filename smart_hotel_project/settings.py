@@ -33,8 +33,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'hotel.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',    
-    'whitenoise.middleware.WhiteNoiseMiddleware',  
+    'hotel.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -99,6 +100,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'smart_hotel_project.wsgi.application'
+ASGI_APPLICATION = 'smart_hotel_project.asgi.application'
+
+# Worker threads used by the async views for ORM access (also caps their DB connections)
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', 20))
 
 DATABASES = {
     'default': {
@@ -176,6 +181,15 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'hotel.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'hotel.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     # 'DEFAULT_THROTTLE_CLASSES': [
@@ -241,4 +255,46 @@ MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
 MQTT_USERNAME = os.getenv('MQTT_USERNAME', '')
 MQTT_PASSWORD = os.getenv('MQTT_PASSWORD', '')
 
+# With acks enabled, device commands are resent when a device doesn't ack them
+# within the timeout. Off until the devices publish acks.
+MQTT_COMMAND_ACKS = os.getenv('MQTT_COMMAND_ACKS', 'false').lower() == 'true'
+MQTT_COMMAND_ACK_TIMEOUT = float(os.getenv('MQTT_COMMAND_ACK_TIMEOUT', 5.0))
+MQTT_COMMAND_RETRIES = int(os.getenv('MQTT_COMMAND_RETRIES', 2))
+
+# Ingested readings that cross an automation threshold schedule a debounced
+# evaluation of their room on a background worker pool
+AUTOMATION_TRIGGERS_ENABLED = os.getenv('AUTOMATION_TRIGGERS_ENABLED', 'true').lower() == 'true'
+AUTOMATION_DEBOUNCE_SECONDS = float(os.getenv('AUTOMATION_DEBOUNCE_SECONDS', 2.0))
+AUTOMATION_WORKERS = int(os.getenv('AUTOMATION_WORKERS', 4))
+
+# Threshold rules (AutomationRule) are evaluated against every ingested IAQ reading
+AUTOMATION_RULES_ENABLED = os.getenv('AUTOMATION_RULES_ENABLED', 'true').lower() == 'true'
+
+# Every room is re-evaluated once per interval by run_automation_scheduler
+AUTOMATION_INTERVAL_SECONDS = int(os.getenv('AUTOMATION_INTERVAL_SECONDS', 30))
+
+# Per-room thermal models are refit from new IAQ readings this often
+THERMAL_MODEL_REFRESH_SECONDS = int(os.getenv('THERMAL_MODEL_REFRESH_SECONDS', 300))
+
+# Device state is cached in every process and kept in sync over Redis pub/sub,
+# entries are still reloaded from the database after this many seconds
+DEVICE_STATE_MAX_AGE = int(os.getenv('DEVICE_STATE_MAX_AGE', 300))
+
+# Chat messages the local parser can't handle go to the assistant; runs that
+# take longer than CHAT_RUN_TIMEOUT seconds are cancelled. Set
+# CHAT_ASSISTANT_CLIENT=fake to answer from a local fake with a simulated latency
+CHAT_ASSISTANT_CLIENT = os.getenv('CHAT_ASSISTANT_CLIENT', 'azure')
+CHAT_FAKE_ASSISTANT_LATENCY = float(os.getenv('CHAT_FAKE_ASSISTANT_LATENCY', 1.0))
+CHAT_RUN_TIMEOUT = float(os.getenv('CHAT_RUN_TIMEOUT', 60))
+
+# Each chat session gets its own assistant thread; this many are kept per
+# process and sessions idle for longer than CHAT_SESSION_IDLE_SECONDS start over
+CHAT_MAX_SESSIONS = int(os.getenv('CHAT_MAX_SESSIONS', 1000))
+CHAT_SESSION_IDLE_SECONDS = int(os.getenv('CHAT_SESSION_IDLE_SECONDS', 1800))
+
+# Responses smaller than this are sent uncompressed
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+RESPONSE_COMPRESSION_GZIP_LEVEL = 6
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 5
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
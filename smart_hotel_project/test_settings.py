@@ -61,6 +61,9 @@ CACHES = {
 # Disable MQTT during tests
 MQTT_ENABLED = False
 
+# Automation is evaluated explicitly in tests, not from background threads
+AUTOMATION_TRIGGERS_ENABLED = False
+
 # Disable throttling in tests
 REST_FRAMEWORK['DEFAULT_THROTTLE_CLASSES'] = []
 REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {}